@@ -0,0 +1,193 @@
+import os
+import re
+import json
+import collections
+
+# Rough token accounting for prompts; Gemini averages about 4 characters per token
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    """Approximate token count of text, without a round trip to count_tokens."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+# Tool results sent back to the model are capped at this many characters of JSON
+TOOL_RESULT_MAX_CHARS = int(os.getenv("TOOL_RESULT_MAX_CHARS", "4000"))
+# and each string inside them (descriptions, snippets) at this many
+TOOL_RESULT_MAX_STRING = 300
+# API bookkeeping the model never needs. organizer is kept: list_events matches queries against it
+TOOL_RESULT_DROP_KEYS = {
+    "kind", "etag", "htmlLink", "iCalUID", "sequence", "created", "updated", "creator",
+    "reminders", "conferenceData", "hangoutLink", "eventType", "guestsCanModify", "guestsCanInviteOthers",
+    "guestsCanSeeOtherGuests", "privateCopy", "locked", "source", "extendedProperties", "metadata",
+}
+
+# Share of the budget spent on the turns around the target, and on earlier
+# turns mentioning the same entities; the rest goes to the summary and headers
+WINDOW_SHARE = 0.6
+ENTITY_SHARE = 0.25
+SUMMARY_TERMS = 12
+
+STOPWORDS = {
+    "a", "about", "actually", "after", "again", "all", "also", "an", "and", "any", "are", "as", "at",
+    "be", "because", "been", "but", "by", "can", "could", "did", "do", "does", "don't", "for", "from",
+    "get", "go", "going", "got", "had", "has", "have", "he", "her", "him", "his", "how", "i", "i'm",
+    "if", "in", "into", "is", "it", "it's", "just", "know", "like", "me", "mean", "mm-hmm", "my", "need",
+    "no", "not", "now", "of", "oh", "ok", "okay", "on", "one", "or", "our", "out", "really", "right",
+    "said", "say", "see", "she", "so", "some", "that", "that's", "the", "their", "them", "then", "there",
+    "they", "thing", "think", "this", "to", "up", "uh", "um", "us", "was", "we", "we're", "well", "were",
+    "what", "when", "where", "which", "who", "will", "with", "would", "yeah", "yes", "you", "your",
+}
+
+ENTITY_PATTERN = re.compile(
+    r"[\w.+-]+@[\w-]+\.[\w.]+"          # email addresses
+    r"|\b[A-Z][A-Z0-9]+-\d+\b"          # issue keys like SCRUM-12
+    r"|\b\d{1,2}(?::\d{2})?\s?[ap]m\b"  # times
+    r"|\b[A-Z][a-z]+\b"                 # capitalized words (names, places, products)
+)
+
+def format_turn(index, message):
+    return f"[{index}] Speaker {message.get('speaker', 'Unknown')}: {message.get('content', '')}"
+
+def extract_entities(text):
+    """Names, emails, issue keys and times mentioned in text, lowercased."""
+    entities = set()
+    for match in ENTITY_PATTERN.finditer(text):
+        value = match.group()
+        # A capitalized word that merely starts a sentence is not a name
+        if value[1:].islower() and (not text[:match.start()].strip() or text[:match.start()].rstrip()[-1] in ".!?"):
+            continue
+        entities.add(value.lower())
+    return entities - STOPWORDS
+
+def build_context(messages, index, token_budget, lines=None):
+    """
+    Transcript context for the attention item at index, kept within token_budget.
+
+    The whole transcript is returned when it fits. Otherwise it contains the
+    turns surrounding the target, earlier turns that mention the same entities
+    (people, emails, issue keys, times) and a compact summary of everything left
+    out, in transcript order with markers where turns were skipped.
+    lines may carry the already formatted turns to avoid formatting them again.
+    """
+    if lines is None:
+        lines = [format_turn(i, message) for i, message in enumerate(messages)]
+    costs = [estimate_tokens(line) + 1 for line in lines]
+    if sum(costs) <= token_budget:
+        return "Full Conversation Transcript:\n" + '\n'.join(lines)
+
+    selected = {index}
+    used = costs[index]
+
+    # 1. Surrounding turns, growing outwards and alternating before/after
+    window_budget = token_budget * WINDOW_SHARE
+    before, after = index - 1, index + 1
+    while before >= 0 or after < len(lines):
+        grew = False
+        for candidate in (before, after):
+            if 0 <= candidate < len(lines) and used + costs[candidate] <= window_budget:
+                selected.add(candidate)
+                used += costs[candidate]
+                grew = True
+        before, after = before - 1, after + 1
+        if not grew:
+            break
+    window_start = min(selected)
+
+    # 2. Earlier turns about the same entities, nearest first
+    entities = extract_entities(' '.join(messages[i].get('content', '') for i in selected))
+    entity_budget = used + token_budget * ENTITY_SHARE
+    if entities:
+        for candidate in range(window_start - 1, -1, -1):
+            if used + costs[candidate] > entity_budget:
+                continue
+            if entities & extract_entities(messages[candidate].get('content', '')):
+                selected.add(candidate)
+                used += costs[candidate]
+
+    # 3. Summary of the omitted turns, then the selected turns in order
+    omitted = [i for i in range(len(lines)) if i not in selected]
+    parts = [
+        f"Conversation Transcript (excerpt: {len(selected)} of {len(lines)} turns shown, "
+        f"focused on index {index}):",
+        summarize_turns(messages, omitted),
+    ]
+    previous = -1
+    for i in sorted(selected):
+        if i > previous + 1:
+            parts.append(f"... [{i - previous - 1} turns omitted] ...")
+        parts.append(lines[i])
+        previous = i
+    if previous < len(lines) - 1:
+        parts.append(f"... [{len(lines) - previous - 1} turns omitted] ...")
+    return '\n'.join(parts)
+
+def summarize_turns(messages, indices):
+    """One-paragraph summary of turns: who spoke and the most frequent topics."""
+    if not indices:
+        return "Summary of omitted turns: none."
+    speakers = collections.Counter(messages[i].get('speaker', 'Unknown') for i in indices)
+    terms = collections.Counter()
+    for i in indices:
+        for word in re.findall(r"[a-z][a-z'-]{2,}", messages[i].get('content', '').lower()):
+            if word not in STOPWORDS:
+                terms[word] += 1
+    speaker_text = ', '.join(f"Speaker {speaker} ({count} turns)" for speaker, count in speakers.most_common())
+    term_text = ', '.join(term for term, _ in terms.most_common(SUMMARY_TERMS)) or 'none'
+    return (
+        f"Summary of omitted turns: {len(indices)} turns between index {indices[0]} and {indices[-1]}; "
+        f"{speaker_text}. Frequent topics: {term_text}."
+    )
+
+def encode_tool_result(result, max_chars=None):
+    """
+    The response dict for a tool's FunctionResponse, in a compact form: API
+    bookkeeping fields and empty values are dropped, calendar times are
+    collapsed to their timestamp and long strings are cut. A list that is
+    still larger than max_chars of JSON keeps only its first items, with a
+    "truncated" note saying how many were left out.
+    """
+    max_chars = TOOL_RESULT_MAX_CHARS if max_chars is None else max_chars
+    result = compact_value(result)
+    if _json_size(result) <= max_chars:
+        return {"result": result}
+    if isinstance(result, list):
+        kept, size = [], 2
+        for item in result:
+            size += _json_size(item) + 1
+            if size > max_chars:
+                break
+            kept.append(item)
+        return {
+            "result": kept,
+            "truncated": f"{len(result) - len(kept)} of {len(result)} items omitted; narrow the query to see them",
+        }
+    text = json.dumps(result, separators=(",", ":"), default=str)
+    return {"result": text[:max_chars], "truncated": f"{len(text) - max_chars} characters omitted"}
+
+def compact_value(value):
+    """value without bookkeeping fields, empty values and overlong strings."""
+    if isinstance(value, dict):
+        # {"dateTime": ..., "timeZone": ...} or {"date": ...}
+        if value.keys() and value.keys() <= {"dateTime", "date", "timeZone"}:
+            moment = value.get("dateTime") or value.get("date")
+            # Keep the zone of a local time; API times carry their offset
+            if value.get("timeZone") and moment and not re.search(r"(Z|[+-]\d\d:\d\d)$", moment) and "T" in moment:
+                return f"{moment} {value['timeZone']}"
+            return moment
+        compact = {}
+        for key, item in value.items():
+            if key in TOOL_RESULT_DROP_KEYS:
+                continue
+            item = compact_value(item)
+            if item is None or item == "" or item == [] or item == {}:
+                continue
+            compact[key] = item
+        return compact
+    if isinstance(value, (list, tuple)):
+        return [compact_value(item) for item in value]
+    if isinstance(value, str) and len(value) > TOOL_RESULT_MAX_STRING:
+        return value[:TOOL_RESULT_MAX_STRING] + f"... [{len(value) - TOOL_RESULT_MAX_STRING} more characters]"
+    return value
+
+def _json_size(value):
+    return len(json.dumps(value, separators=(",", ":"), default=str))
@@ -0,0 +1,120 @@
+import os
+import re
+import json
+import difflib
+import hashlib
+import datetime
+
+# Minimum similarity of two event summaries (0-1) for events with the same fingerprint to be merged
+DEDUP_SIMILARITY = float(os.getenv("DEDUP_SIMILARITY", "0.8"))
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+NUMBER_PATTERN = re.compile(r"[0-9]+")
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+# Actions whose text is the whole proposal; they only merge when it matches exactly
+EXACT_TEXT_ACTIONS = ("send_email", "create_jira_issue", "send_slack_message")
+# Free-text fields that are never overwritten by a merge, so duplicates must agree on them
+CONTENT_FIELDS = ("body", "description", "message", "location")
+
+def fingerprint(data):
+    """
+    Hash of the structural parts of a proposal: action type, target id, time
+    range, recipients and the numbers in its summary. Emails, Jira issues and
+    Slack messages also include their normalized text. Proposals with
+    different fingerprints are never duplicates; events with the same
+    fingerprint are compared by summary.
+    """
+    key = json.dumps(_structure(data), sort_keys=True)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def is_duplicate(data, other):
+    """True if two proposals with the same fingerprint describe the same action."""
+    if _structure(data) != _structure(other):
+        return False
+    if not _compatible((data or {}).get("body") or {}, (other or {}).get("body") or {}):
+        return False
+    first, second = _summary(data), _summary(other)
+    if not first or not second:
+        return first == second
+    return difflib.SequenceMatcher(None, first, second).ratio() >= DEDUP_SIMILARITY
+
+def merge(existing, duplicate):
+    """
+    Folds a duplicate proposal into the stored action: fields only the
+    duplicate has are filled in and the duplicate is counted. Duplicates
+    agree on every content field, so no text of the duplicate is lost.
+    """
+    merged = dict(existing)
+    merged["data"] = _fill(existing.get("data") or {}, duplicate.get("data") or {})
+    merged["duplicates"] = existing.get("duplicates", 0) + 1
+    return merged
+
+def _structure(data):
+    data = data or {}
+    action = data.get("action")
+    body = data.get("body") or {}
+    structure = {"action": action}
+    if data.get("id"):
+        structure["id"] = data["id"]
+    if action in ("create", "update"):
+        structure["start"] = _normalize_time(body.get("start"))
+        structure["end"] = _normalize_time(body.get("end"))
+        structure["attendees"] = _recipients(
+            " ".join(attendee.get("email", "") for attendee in body.get("attendees") or [])
+        )
+    elif action == "send_email":
+        structure["recipients"] = _recipients(body.get("recipient"))
+    # "Issue 10" and "Issue 20", or "Q3" and "Q4", are different actions however similar
+    structure["numbers"] = NUMBER_PATTERN.findall(_summary(data))
+    if action in EXACT_TEXT_ACTIONS:
+        structure["summary"] = _summary(data)
+        structure["content"] = {field: _normalize_text(body.get(field)) for field in CONTENT_FIELDS if body.get(field)}
+    return structure
+
+def _summary(data):
+    body = (data or {}).get("body") or {}
+    return _normalize_text(body.get("summary") or body.get("subject") or body.get("message"))
+
+def _normalize_text(text):
+    return " ".join(WORD_PATTERN.findall(str(text or "").lower()))
+
+def _compatible(body, other):
+    # A content field both proposals fill in must say the same thing
+    for field in CONTENT_FIELDS:
+        first, second = _normalize_text(body.get(field)), _normalize_text(other.get(field))
+        if first and second and first != second:
+            return False
+    return True
+
+def _recipients(text):
+    return sorted({email.lower() for email in EMAIL_PATTERN.findall(text or "")})
+
+def _normalize_time(value):
+    # Calendar times as {"dateTime": ..., "timeZone": ...} or {"date": ...}
+    if not isinstance(value, dict):
+        return None
+    if value.get("date"):
+        return value["date"]
+    raw = value.get("dateTime")
+    if not raw:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(raw)
+    except ValueError:
+        return raw
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    else:
+        # A naive time is interpreted in its timeZone, which is part of the key
+        return f"{parsed:%Y-%m-%dT%H:%M} {value.get('timeZone', '')}".strip()
+    return f"{parsed:%Y-%m-%dT%H:%M}Z"
+
+def _fill(existing, duplicate):
+    filled = dict(existing)
+    for key, value in duplicate.items():
+        if key not in filled or filled[key] in (None, "", [], {}):
+            filled[key] = value
+        elif isinstance(filled[key], dict) and isinstance(value, dict):
+            filled[key] = _fill(filled[key], value)
+    return filled
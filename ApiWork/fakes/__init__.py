@@ -0,0 +1,441 @@
+"""
+In-process stand-ins for external clients, for offline benchmarks.
+
+FakeGenaiClient mimics the parts of genai.Client the agent loop uses
+(chats, caches and their .aio counterparts) and bills tokens the way the
+Gemini API does: every send_message is charged for the whole chat history,
+and content read from a cache is counted separately from fresh prompt tokens.
+
+The Calendar, Gmail, People, Jira and Slack fakes answer the calls the app
+makes from in-memory data. Every fake takes a latency in seconds that each
+round trip sleeps for (a batch HTTP request is one round trip), so the
+concurrency of the agent loop can be measured without a network.
+"""
+import asyncio
+import collections
+import datetime
+import itertools
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from ApiWork.context import estimate_tokens
+
+# Approximate size of one tool's function declaration in the prompt
+TOOL_DECLARATION_TOKENS = 60
+
+# Default conversation: propose one Jira issue, then finish
+DEFAULT_SCRIPT = [
+    [("create_jira_issue_tool", {"summary": "Follow up", "description": "Proposed by the fake model"})],
+]
+
+def _text_of(content):
+    """Flattens prompts, Parts and Contents into text for token estimates."""
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, (list, tuple)):
+        return "".join(_text_of(item) for item in content)
+    for attr in ("text", "function_response", "parts"):
+        value = getattr(content, attr, None)
+        if value is not None:
+            if attr == "function_response":
+                return json.dumps(getattr(value, "response", None), default=str)
+            return _text_of(value)
+    return str(content)
+
+class FakeGenaiClient:
+    """
+    Scripted genai.Client. script is a list of model turns; each turn is a list
+    of (tool_name, args) function calls. Once the script is exhausted the model
+    answers with plain text. structured is the JSON answer to
+    models.generate_content calls (structured-output mode), or a function
+    from the prompt to that answer. Token usage is accumulated in self.usage:
+
+        prompt_tokens   input tokens billed at the full rate
+        cached_tokens   input tokens served from cached content
+        cache_tokens    tokens written into cached contents
+        requests        generate calls
+
+    Every generate call sleeps for latency seconds (asyncio.sleep on .aio).
+    """
+
+    def __init__(self, script=None, structured=None, latency=0):
+        self.script = DEFAULT_SCRIPT if script is None else script
+        self.structured = {"actions": []} if structured is None else structured
+        self.latency = latency
+        self.usage = collections.Counter()
+        self._lock = threading.Lock()
+        self._caches = {}
+        self._cache_ids = itertools.count(1)
+        self.chats = _FakeChats(self)
+        self.caches = _FakeCaches(self)
+        self.models = _FakeModels(self)
+        self.aio = SimpleNamespace(chats=_AsyncFakeChats(self), caches=_AsyncFakeCaches(self), models=_AsyncFakeModels(self))
+
+    def _bill(self, **tokens):
+        with self._lock:
+            self.usage.update(tokens)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    async def _wait_async(self):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+class FakeChat:
+    def __init__(self, client, config):
+        self._client = client
+        self._history_tokens = 0
+        self._turn = 0
+        cached_content = getattr(config, "cached_content", None)
+        if cached_content:
+            self._cached_tokens = client._caches[cached_content]
+            self._prefix_tokens = 0
+        else:
+            tools = getattr(config, "tools", None) or []
+            self._cached_tokens = 0
+            self._prefix_tokens = len(tools) * TOOL_DECLARATION_TOKENS
+
+    def send_message(self, message):
+        self._client._wait()
+        return self._respond(message)
+
+    def _respond(self, message):
+        message_tokens = estimate_tokens(_text_of(message))
+        self._client._bill(
+            prompt_tokens=self._prefix_tokens + self._history_tokens + message_tokens,
+            cached_tokens=self._cached_tokens,
+            requests=1,
+        )
+        response = self._next_response()
+        self._history_tokens += message_tokens + estimate_tokens(json.dumps(response.raw))
+        return response
+
+    def _next_response(self):
+        script = self._client.script
+        calls = script[self._turn] if self._turn < len(script) else []
+        self._turn += 1
+        function_calls = [SimpleNamespace(name=name, args=dict(args)) for name, args in calls]
+        return SimpleNamespace(
+            function_calls=function_calls or None,
+            text=None if function_calls else "Done.",
+            raw=[[name, args] for name, args in calls],
+        )
+
+class _AsyncFakeChat:
+    def __init__(self, chat):
+        self._chat = chat
+
+    async def send_message(self, message):
+        await self._chat._client._wait_async()
+        return self._chat._respond(message)
+
+class _FakeChats:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model, config=None, history=None):
+        return FakeChat(self._client, config)
+
+class _AsyncFakeChats(_FakeChats):
+    def create(self, model, config=None, history=None):
+        return _AsyncFakeChat(FakeChat(self._client, config))
+
+class _FakeModels:
+    def __init__(self, client):
+        self._client = client
+
+    def generate_content(self, model, contents=None, config=None):
+        self._client._wait()
+        return self._respond(contents)
+
+    def _respond(self, contents):
+        client = self._client
+        answer = client.structured(contents) if callable(client.structured) else client.structured
+        client._bill(prompt_tokens=estimate_tokens(_text_of(contents)), requests=1)
+        return SimpleNamespace(parsed=None, text=json.dumps(answer), function_calls=None)
+
+class _AsyncFakeModels(_FakeModels):
+    async def generate_content(self, model, contents=None, config=None):
+        await self._client._wait_async()
+        return self._respond(contents)
+
+class _FakeCaches:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model, config=None):
+        client = self._client
+        tokens = estimate_tokens(_text_of(config.system_instruction) + _text_of(config.contents))
+        tokens += sum(len(tool.function_declarations or []) for tool in config.tools or []) * TOOL_DECLARATION_TOKENS
+        name = f"cachedContents/fake-{next(client._cache_ids)}"
+        with client._lock:
+            client._caches[name] = tokens
+        client._bill(cache_tokens=tokens)
+        return SimpleNamespace(name=name)
+
+    def delete(self, name):
+        with self._client._lock:
+            self._client._caches.pop(name, None)
+
+class _AsyncFakeCaches(_FakeCaches):
+    async def create(self, model, config=None):
+        return _FakeCaches.create(self, model, config)
+
+    async def delete(self, name):
+        _FakeCaches.delete(self, name)
+
+# --- Google API clients ---
+
+def _not_found(what):
+    response = httplib2.Response({"status": 404})
+    response.reason = "Not Found"
+    return HttpError(response, f"{what} not found".encode())
+
+class FakeRequest:
+    """A prepared API call; execute() is one round trip."""
+
+    def __init__(self, service, handler, kwargs):
+        self._service = service
+        self._handler = handler
+        self._kwargs = kwargs
+
+    def execute(self):
+        self._service._wait()
+        return self._run()
+
+    def _run(self):
+        with self._service._lock:
+            self._service.calls[self._handler.__name__.lstrip("_")] += 1
+            return self._handler(**self._kwargs)
+
+class FakeBatchRequest:
+    """Mimics BatchHttpRequest: every added request is answered in one round trip."""
+
+    def __init__(self, service, callback=None):
+        self._service = service
+        self._callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        request_id = str(len(self._requests)) if request_id is None else request_id
+        self._requests.append((request_id, request, callback or self._callback))
+
+    def execute(self):
+        self._service._wait()
+        with self._service._lock:
+            self._service.calls["batch"] += 1
+        for request_id, request, callback in self._requests:
+            try:
+                response, exception = request._run(), None
+            except HttpError as error:
+                response, exception = None, error
+            if callback is not None:
+                callback(request_id, response, exception)
+
+class _FakeService:
+    """Shared plumbing: latency, a lock over the data and per-method call counts."""
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.calls = collections.Counter()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _request(self, handler, **kwargs):
+        return FakeRequest(self, handler, kwargs)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatchRequest(self, callback)
+
+def sample_events(count=20, start=None):
+    """
+    count one-hour events, one every six hours from start (default: now),
+    with the bookkeeping fields a full Calendar resource carries.
+    """
+    start = start or datetime.datetime.now(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+    events = []
+    for n in range(count):
+        begin = start + datetime.timedelta(hours=6 * n)
+        events.append({
+            "kind": "calendar#event",
+            "etag": f"\"3{n:015d}\"",
+            "id": f"event{n}",
+            "status": "confirmed",
+            "htmlLink": f"https://www.google.com/calendar/event?eid=ZXZlbnQ{n}",
+            "created": start.isoformat(),
+            "updated": start.isoformat(),
+            "summary": f"Meeting {n}",
+            "creator": {"email": "me@example.com", "self": True},
+            "organizer": {"email": "me@example.com", "self": True},
+            "start": {"dateTime": begin.isoformat(), "timeZone": "America/Detroit"},
+            "end": {"dateTime": (begin + datetime.timedelta(hours=1)).isoformat(), "timeZone": "America/Detroit"},
+            "iCalUID": f"event{n}@google.com",
+            "sequence": 0,
+            "attendees": [{"email": "grantow@umich.edu", "responseStatus": "needsAction"}],
+            "reminders": {"useDefault": True},
+            "eventType": "default",
+        })
+    return events
+
+class FakeCalendarService(_FakeService):
+    """
+    events() on the primary calendar. list always answers with every event,
+    and fields= is ignored, so answers look like unprojected responses.
+    """
+
+    def __init__(self, events=None, latency=0):
+        super().__init__(latency)
+        events = sample_events() if events is None else events
+        self.events_by_id = {event["id"]: dict(event) for event in events}
+
+    def events(self):
+        return SimpleNamespace(
+            list=lambda **kwargs: self._request(self._list, **kwargs),
+            get=lambda **kwargs: self._request(self._get, **kwargs),
+            insert=lambda **kwargs: self._request(self._insert, **kwargs),
+            patch=lambda **kwargs: self._request(self._patch, **kwargs),
+            delete=lambda **kwargs: self._request(self._delete, **kwargs),
+        )
+
+    def _list(self, **kwargs):
+        return {"items": [dict(event) for event in self.events_by_id.values()], "nextSyncToken": "fake"}
+
+    def _get(self, calendarId, eventId, fields=None):
+        if eventId not in self.events_by_id:
+            raise _not_found(f"Event {eventId}")
+        return dict(self.events_by_id[eventId])
+
+    def _insert(self, calendarId, body):
+        event = dict(body, id=f"created{next(self._ids)}", status="confirmed")
+        self.events_by_id[event["id"]] = event
+        return dict(event)
+
+    def _patch(self, calendarId, eventId, body):
+        if eventId not in self.events_by_id:
+            raise _not_found(f"Event {eventId}")
+        self.events_by_id[eventId].update(body)
+        return dict(self.events_by_id[eventId])
+
+    def _delete(self, calendarId, eventId):
+        if self.events_by_id.pop(eventId, None) is None:
+            raise _not_found(f"Event {eventId}")
+        return ""
+
+def sample_emails(count=20):
+    return [
+        {"id": f"msg{n}", "subject": f"Status update {n}", "sender": f"Sender {n} <sender{n}@example.com>",
+         "snippet": f"Notes from thread {n}"}
+        for n in range(count)
+    ]
+
+class FakeGmailService(_FakeService):
+    """users().messages() list, get and send. Sent messages are kept in self.sent."""
+
+    def __init__(self, emails=None, latency=0):
+        super().__init__(latency)
+        self.emails = sample_emails() if emails is None else emails
+        self.sent = []
+
+    def users(self):
+        messages = SimpleNamespace(
+            list=lambda **kwargs: self._request(self._list, **kwargs),
+            get=lambda **kwargs: self._request(self._get, **kwargs),
+            send=lambda **kwargs: self._request(self._send, **kwargs),
+        )
+        return SimpleNamespace(messages=lambda: messages)
+
+    def _list(self, userId, q=None, maxResults=10, fields=None):
+        return {"messages": [{"id": email["id"]} for email in self.emails[:maxResults]]}
+
+    def _get(self, userId, id, **kwargs):
+        email = next((email for email in self.emails if email["id"] == id), None)
+        if email is None:
+            raise _not_found(f"Message {id}")
+        headers = [{"name": "Subject", "value": email["subject"]}, {"name": "From", "value": email["sender"]}]
+        return {"id": id, "snippet": email["snippet"], "payload": {"headers": headers}}
+
+    def _send(self, userId, body):
+        message = {"id": f"sent{next(self._ids)}", "labelIds": ["SENT"]}
+        self.sent.append(dict(body, id=message["id"]))
+        return message
+
+def sample_people(count=50):
+    people = [("Grant Wang", "grantow@umich.edu")]
+    people += [(f"Person {n}", f"person{n}@example.com") for n in range(1, count)]
+    return people
+
+class FakePeopleService(_FakeService):
+    """people().connections() and otherContacts() as used by the directory sync."""
+
+    def __init__(self, contacts=None, other_contacts=(), latency=0):
+        super().__init__(latency)
+        self.contacts = sample_people() if contacts is None else contacts
+        self.other_contacts = list(other_contacts)
+
+    @staticmethod
+    def _person(kind, n, name, email):
+        return {
+            "resourceName": f"{kind}/{n}",
+            "names": [{"displayName": name}],
+            "emailAddresses": [{"value": email}],
+            "metadata": {},
+        }
+
+    def people(self):
+        connections = SimpleNamespace(list=lambda **kwargs: self._request(self._connections, **kwargs))
+        return SimpleNamespace(connections=lambda: connections)
+
+    def otherContacts(self):
+        return SimpleNamespace(list=lambda **kwargs: self._request(self._other_contacts, **kwargs))
+
+    def _connections(self, **kwargs):
+        people = [self._person("people", n, name, email) for n, (name, email) in enumerate(self.contacts)]
+        return {"connections": people, "nextSyncToken": "fake"}
+
+    def _other_contacts(self, **kwargs):
+        people = [self._person("otherContacts", n, name, email) for n, (name, email) in enumerate(self.other_contacts)]
+        return {"otherContacts": people, "nextSyncToken": "fake"}
+
+# --- Jira and Slack ---
+
+class FakeJiraClient(_FakeService):
+    """create_issue on a single project; created issues are kept in self.issues."""
+
+    def __init__(self, latency=0):
+        super().__init__(latency)
+        self.issues = []
+
+    def create_issue(self, project, summary, description=None, issuetype=None):
+        self._wait()
+        with self._lock:
+            number = next(self._ids)
+            self.calls["create_issue"] += 1
+            self.issues.append({"project": project, "summary": summary, "description": description})
+        return SimpleNamespace(key=f"{project}-{number}", id=str(10000 + number))
+
+class FakeSlackClient(_FakeService):
+    """chat_postMessage; posted messages are kept in self.messages."""
+
+    def __init__(self, latency=0):
+        super().__init__(latency)
+        self.messages = []
+
+    def chat_postMessage(self, channel, text):
+        self._wait()
+        with self._lock:
+            self.calls["chat_postMessage"] += 1
+            self.messages.append({"channel": channel, "text": text})
+            return {"ok": True, "channel": channel, "ts": f"{time.time():.6f}"}
@@ -1,52 +1,43 @@
+import logging
+import os
+import time
+import bisect
 import datetime
-import os.path
+import threading
+from zoneinfo import ZoneInfo
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
-from ApiWork.utils import SCOPES
+from ApiWork.utils import build_service
 
-def get_calendar_service():
-    """Shows basic usage of the Google Calendar API.
-    Returns the service object.
-    """
-    creds = None
-    if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-        if not set(SCOPES).issubset(set(creds.scopes or [])):
-            print("Existing token lacks required scopes, re-running OAuth flow...")
-            creds = None
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                "ApiWork/credentials.json", SCOPES
-            )
-            creds = flow.run_local_server(port=0)
-        # Save the credentials for the next run
-        with open("token.json", "w") as token:
-            token.write(creds.to_json())
+logger = logging.getLogger(__name__)
 
-    try:
-        service = build("calendar", "v3", credentials=creds)
-        return service
-    except HttpError as error:
-        print(f"An error occurred: {error}")
-        return None
+# Seconds before the calendar mirror pulls incremental changes again
+CALENDAR_SYNC_TTL = int(os.getenv("CALENDAR_SYNC_TTL", "60"))
+# Time zone assumed for timestamps without an offset, matching the event tools
+DEFAULT_TIMEZONE = "America/Detroit"
+# Calendar accepts at most 50 calls per batch HTTP request
+CALENDAR_BATCH_SIZE = 50
+# Event fields the mirror and the agent use; the rest (etag, links, reminders...) is never fetched
+EVENT_FIELDS = "id,status,summary,description,location,start,end,attendees(email,displayName,responseStatus),organizer/email"
+
+def get_calendar_service():
+    """Returns the Calendar service object, built on the shared credentials."""
+    return build_service("calendar", "v3")
 
 def get_event(service, event_id):
-    """Retrieves a single event by ID."""
+    """Retrieves a single event by ID, from the local mirror when possible."""
+    event = EVENT_STORE.get(service, event_id)
+    if event is not None:
+        return event
     try:
-        event = service.events().get(calendarId='primary', eventId=event_id).execute()
+        event = service.events().get(calendarId='primary', eventId=event_id, fields=EVENT_FIELDS).execute()
+        EVENT_STORE.apply(event)
         return event
     except HttpError as error:
         if error.resp.status == 404:
             return None
-        print(f"An error occurred fetching event {event_id}: {error}")
+        logger.warning("An error occurred fetching event %s: %s", event_id, error)
         return None
 
 def propose_create_event(event_body):
@@ -75,31 +66,88 @@ def propose_delete_event(service, event_id):
 def execute_create_event(service, data):
     """Creates a new calendar event."""
     body = data.get('body')
-    print(f"Creating event: {body.get('summary', 'Unknown')}")
-    return service.events().insert(calendarId='primary', body=body).execute()
+    logger.info("Creating event: %s", body.get('summary', 'Unknown'))
+    event = service.events().insert(calendarId='primary', body=body).execute()
+    EVENT_STORE.apply(event)
+    return event
 
 def execute_update_event(service, data):
     """Updates an existing calendar event."""
     event_id = data.get('id')
     body = data.get('body')
-    print(f"Updating event ID: {event_id}")
-    return service.events().patch(
+    logger.info("Updating event ID: %s", event_id)
+    event = service.events().patch(
         calendarId='primary', 
         eventId=event_id, 
         body=body
     ).execute()
+    EVENT_STORE.apply(event)
+    return event
 
 def execute_delete_event(service, data):
     """Deletes a calendar event."""
     event_id = data.get('id')
-    print(f"Deleting event ID: {event_id}")
+    logger.info("Deleting event ID: %s", event_id)
     service.events().delete(calendarId='primary', eventId=event_id).execute()
+    EVENT_STORE.remove(event_id)
     return {"id": event_id, "status": "deleted"}
 
+def build_action_request(service, action_data):
+    """The unexecuted API request for a calendar action, or None for an unknown action."""
+    action = action_data.get("action")
+    if action == "create":
+        return service.events().insert(calendarId='primary', body=action_data.get('body'))
+    if action == "update":
+        return service.events().patch(calendarId='primary', eventId=action_data.get('id'), body=action_data.get('body'))
+    if action == "delete":
+        return service.events().delete(calendarId='primary', eventId=action_data.get('id'))
+    return None
+
+def execute_actions(service, actions):
+    """
+    Executes several calendar actions with batch HTTP requests.
+    actions maps a request id to action data; returns {request id: (result, error)}.
+    A batch request that fails fails only its own calls; outcomes of the
+    batches sent before it are kept.
+    """
+    outcomes = {}
+
+    def collect(request_id, response, exception):
+        if exception is not None:
+            logger.warning("Calendar action %s failed: %s", request_id, exception)
+            outcomes[request_id] = (None, exception)
+            return
+        data = actions[request_id]
+        if data.get("action") == "delete":
+            EVENT_STORE.remove(data.get('id'))
+            outcomes[request_id] = ({"id": data.get('id'), "status": "deleted"}, None)
+        else:
+            EVENT_STORE.apply(response)
+            outcomes[request_id] = (response, None)
+
+    items = list(actions.items())
+    for start in range(0, len(items), CALENDAR_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=collect)
+        for request_id, data in items[start:start + CALENDAR_BATCH_SIZE]:
+            api_request = build_action_request(service, data)
+            if api_request is None:
+                outcomes[request_id] = (None, ValueError(f"Unknown calendar action: {data.get('action')}"))
+            else:
+                batch.add(api_request, request_id=request_id)
+        logger.info("Executing %s calendar actions in one batch", len(items[start:start + CALENDAR_BATCH_SIZE]))
+        try:
+            batch.execute()
+        except Exception as error:
+            logger.warning("Calendar batch request failed: %s", error)
+            for request_id, _ in items[start:start + CALENDAR_BATCH_SIZE]:
+                outcomes.setdefault(request_id, (None, error))
+    return outcomes
+
 def list_events(service, time_min=None, time_max=None, max_results=10, query=None):
     """
     Returns a list of events within the specified time range.
     Defaults to upcoming 10 events if no range specified.
+    Answered from the local mirror of the primary calendar.
     """
     if not time_min:
         time_min = datetime.datetime.now(tz=datetime.timezone.utc).isoformat()
@@ -110,22 +158,176 @@ def list_events(service, time_min=None, time_max=None, max_results=10, query=Non
     if isinstance(time_max, datetime.datetime):
         time_max = time_max.isoformat()
         
-    print(f"Fetching events from {time_min} to {time_max if time_max else 'Future'} with query: {query}")
+    logger.debug("Fetching events from %s to %s with query: %s", time_min, time_max or 'Future', query)
     
-    events_result = (
-        service.events()
-        .list(
-            calendarId="primary",
-            timeMin=time_min,
-            timeMax=time_max,
-            maxResults=max_results,
+    return EVENT_STORE.list(service, time_min, time_max, max_results, query)
+
+class EventStore:
+    """
+    Local mirror of the primary calendar.
+
+    The first read does a full paginated sync; after CALENDAR_SYNC_TTL seconds the
+    next read pulls only the changes using the Calendar API syncToken. Events are
+    kept in an interval index ordered by start time, so range queries and lookups
+    by id never go to the API. Writes made through execute_* are applied directly.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = CALENDAR_SYNC_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._events = {}  # event id -> event resource
+        self._sync_token = None
+        self._synced_at = None
+        self._index = _build_interval_index({})
+
+    def get(self, service, event_id):
+        self.refresh(service)
+        return self._events.get(event_id)
+
+    def list(self, service, time_min, time_max=None, max_results=10, query=None):
+        """Events overlapping [time_min, time_max), ordered by start time."""
+        self.refresh(service)
+        events, index = self._events, self._index
+        lower = _parse_time(time_min)
+        upper = _parse_time(time_max) if time_max else None
+        terms = (query or '').lower().split()
+
+        # Any event overlapping the range starts after lower - longest duration
+        starts, entries = index['starts'], index['entries']
+        position = bisect.bisect_left(starts, lower - index['max_duration'])
+        results = []
+        while position < len(entries) and len(results) < max_results:
+            start, end, event_id = entries[position]
+            position += 1
+            if upper is not None and start >= upper:
+                break
+            if end <= lower:
+                continue
+            event = events.get(event_id)
+            if event is None:
+                continue
+            if terms and not all(term in _search_text(event) for term in terms):
+                continue
+            results.append(event)
+        return results
+
+    def apply(self, event):
+        """Insert or replace an event after a write, without waiting for the next sync."""
+        if not event or 'id' not in event:
+            return
+        with self._lock:
+            events = dict(self._events)
+            if event.get('status') == 'cancelled':
+                events.pop(event['id'], None)
+            else:
+                events[event['id']] = event
+            self._events, self._index = events, _build_interval_index(events)
+
+    def remove(self, event_id):
+        with self._lock:
+            if event_id not in self._events:
+                return
+            events = dict(self._events)
+            del events[event_id]
+            self._events, self._index = events, _build_interval_index(events)
+
+    def refresh(self, service, force=False):
+        """Syncs with the Calendar API if the mirror is older than the TTL."""
+        if not force and self._synced_at is not None and time.monotonic() - self._synced_at < self.ttl:
+            return
+        with self._lock:
+            if not force and self._synced_at is not None and time.monotonic() - self._synced_at < self.ttl:
+                return
+            events = dict(self._events)
+            sync_token = self._sync_token
+            try:
+                try:
+                    changes, next_sync_token = _list_all_events(service, sync_token)
+                except HttpError as error:
+                    # 410 Gone: the sync token is no longer valid, start over
+                    if sync_token is None or error.resp.status != 410:
+                        raise
+                    logger.info("Calendar sync token expired, running a full sync")
+                    sync_token = None
+                    changes, next_sync_token = _list_all_events(service, None)
+            except HttpError as error:
+                logger.warning("An error occurred syncing calendar events: %s", error)
+                if self._synced_at is None:
+                    raise
+                return
+
+            if sync_token is None:
+                events = {}
+            for event in changes:
+                if event.get('status') == 'cancelled':
+                    events.pop(event['id'], None)
+                else:
+                    events[event['id']] = event
+
+            self._events, self._index = events, _build_interval_index(events)
+            self._sync_token = next_sync_token
+            self._synced_at = time.monotonic()
+
+def _list_all_events(service, sync_token):
+    """Pages through the primary calendar. Returns (events, next_sync_token)."""
+    results = []
+    page_token = None
+    while True:
+        response = service.events().list(
+            calendarId='primary',
             singleEvents=True,
-            orderBy="startTime",
-            q=query
-        )
-        .execute()
-    )
-    return events_result.get("items", [])
+            maxResults=2500,
+            syncToken=sync_token,
+            pageToken=page_token,
+            fields=f"items({EVENT_FIELDS}),nextPageToken,nextSyncToken"
+        ).execute()
+        results.extend(response.get('items', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return results, response.get('nextSyncToken')
+
+def _parse_time(value):
+    """Parses an RFC 3339 timestamp or a date to an aware datetime (naive means DEFAULT_TIMEZONE)."""
+    if isinstance(value, datetime.datetime):
+        parsed = value
+    elif len(value) == 10:
+        parsed = datetime.datetime.combine(datetime.date.fromisoformat(value), datetime.time())
+    else:
+        parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=ZoneInfo(DEFAULT_TIMEZONE))
+    return parsed
+
+def _event_time(point):
+    return _parse_time(point.get('dateTime') or point.get('date'))
+
+def _build_interval_index(events):
+    entries = []
+    max_duration = datetime.timedelta(0)
+    for event_id, event in events.items():
+        try:
+            start, end = _event_time(event['start']), _event_time(event['end'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        entries.append((start, end, event_id))
+        max_duration = max(max_duration, end - start)
+    entries.sort(key=lambda entry: (entry[0], entry[2]))
+    return {
+        'entries': entries,
+        'starts': [entry[0] for entry in entries],
+        'max_duration': max_duration,
+    }
+
+def _search_text(event):
+    """Text matched by free-text queries, like the API's q parameter."""
+    parts = [event.get('summary', ''), event.get('description', ''), event.get('location', '')]
+    for attendee in event.get('attendees', []):
+        parts.append(attendee.get('email', ''))
+        parts.append(attendee.get('displayName', ''))
+    parts.append(event.get('organizer', {}).get('email', ''))
+    return ' '.join(parts).lower()
+
+EVENT_STORE = EventStore()
 
 def execute_action(service, action_data):
     """
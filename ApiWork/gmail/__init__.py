@@ -1,40 +1,20 @@
-import os.path
+import logging
 import base64
 from email.message import EmailMessage
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
-from ApiWork.utils import SCOPES
+from ApiWork.utils import build_service
+
+logger = logging.getLogger(__name__)
+
+# Headers read_emails needs; everything else in the message is skipped
+METADATA_HEADERS = ['Subject', 'From']
+# Gmail allows up to 100 calls per batch but recommends 50 to avoid rate limiting
+GMAIL_BATCH_SIZE = 50
 
 def get_services():
     """Returns the Gmail service."""
-    creds = None
-    if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-        if not set(SCOPES).issubset(set(creds.scopes or [])):
-            print("Existing token lacks required scopes, re-running OAuth flow...")
-            creds = None
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                "ApiWork/credentials.json", SCOPES
-            )
-            creds = flow.run_local_server(port=0)
-        # Save the credentials for the next run
-        with open("token.json", "w") as token:
-            token.write(creds.to_json())
-
-    try:
-        gmail_service = build("gmail", "v1", credentials=creds)
-        return gmail_service
-    except HttpError as error:
-        print(f"An error occurred: {error}")
-        return None
+    return build_service("gmail", "v1")
 
 def read_emails(gmail_service, query=None, max_results=10):
     """
@@ -49,12 +29,40 @@ def read_emails(gmail_service, query=None, max_results=10):
         list: List of email dictionaries with id, subject, sender, snippet.
     """
     try:
-        results = gmail_service.users().messages().list(userId='me', q=query, maxResults=max_results).execute()
+        results = gmail_service.users().messages().list(
+            userId='me', q=query, maxResults=max_results, fields='messages/id'
+        ).execute()
         messages = results.get('messages', [])
         
+        # Fetch only the headers we need, GMAIL_BATCH_SIZE messages per HTTP round trip
+        details = {}
+
+        def collect(request_id, response, exception):
+            if exception is not None:
+                logger.warning("An error occurred fetching email %s: %s", request_id, exception)
+                return
+            details[request_id] = response
+
+        for start in range(0, len(messages), GMAIL_BATCH_SIZE):
+            batch = gmail_service.new_batch_http_request(callback=collect)
+            for msg in messages[start:start + GMAIL_BATCH_SIZE]:
+                batch.add(
+                    gmail_service.users().messages().get(
+                        userId='me',
+                        id=msg['id'],
+                        format='metadata',
+                        metadataHeaders=METADATA_HEADERS,
+                        fields='id,snippet,payload/headers'
+                    ),
+                    request_id=msg['id']
+                )
+            batch.execute()
+        
         email_data = []
         for msg in messages:
-            msg_detail = gmail_service.users().messages().get(userId='me', id=msg['id']).execute()
+            msg_detail = details.get(msg['id'])
+            if msg_detail is None:
+                continue
             payload = msg_detail.get('payload', {})
             headers = payload.get('headers', [])
             
@@ -72,7 +80,7 @@ def read_emails(gmail_service, query=None, max_results=10):
             
         return email_data
     except HttpError as error:
-        print(f"An error occurred reading emails: {error}")
+        logger.warning("An error occurred reading emails: %s", error)
         return []
 
 def propose_send_email(recipient, subject, body):
@@ -89,6 +97,19 @@ def propose_send_email(recipient, subject, body):
         }
     }
 
+def encode_draft(draft_structure):
+    """The raw message body Gmail's send call expects for a draft structure."""
+    message = EmailMessage()
+    message.set_content(draft_structure['body'])
+    message['To'] = draft_structure['recipient']
+    message['Subject'] = draft_structure['subject']
+    
+    encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
+    
+    return {
+        'raw': encoded_message
+    }
+
 def execute_send_email(service, draft_structure):
     """
     Sends an email based on the draft structure.
@@ -98,20 +119,45 @@ def execute_send_email(service, draft_structure):
         draft_structure (dict): Dictionary with recipient, subject, body.
     """
     try:
-        message = EmailMessage()
-        message.set_content(draft_structure['body'])
-        message['To'] = draft_structure['recipient']
-        message['Subject'] = draft_structure['subject']
-        
-        encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-        
-        create_message = {
-            'raw': encoded_message
-        }
+        create_message = encode_draft(draft_structure)
         
         send_message = (service.users().messages().send(userId="me", body=create_message).execute())
-        print(f"Message Id: {send_message['id']}")
+        logger.info("Message Id: %s", send_message['id'])
         return send_message
     except HttpError as error:
-        print(f"An error occurred sending email: {error}")
-        return None
\ No newline at end of file
+        logger.warning("An error occurred sending email: %s", error)
+        return None
+
+def execute_send_emails(service, drafts):
+    """
+    Sends several emails with batch HTTP requests.
+    drafts maps a request id to a draft structure; returns {request id: (result, error)}.
+    A batch request that fails fails only its own emails; outcomes of the
+    batches sent before it are kept.
+    """
+    outcomes = {}
+
+    def collect(request_id, response, exception):
+        if exception is not None:
+            logger.warning("An error occurred sending email %s: %s", request_id, exception)
+            outcomes[request_id] = (None, exception)
+        else:
+            outcomes[request_id] = (response, None)
+
+    items = list(drafts.items())
+    for start in range(0, len(items), GMAIL_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=collect)
+        for request_id, draft_structure in items[start:start + GMAIL_BATCH_SIZE]:
+            try:
+                create_message = encode_draft(draft_structure or {})
+            except (KeyError, TypeError) as error:
+                outcomes[request_id] = (None, ValueError(f"Incomplete email draft: {error}"))
+                continue
+            batch.add(service.users().messages().send(userId="me", body=create_message), request_id=request_id)
+        try:
+            batch.execute()
+        except Exception as error:
+            logger.warning("Gmail batch request failed: %s", error)
+            for request_id, _ in items[start:start + GMAIL_BATCH_SIZE]:
+                outcomes.setdefault(request_id, (None, error))
+    return outcomes
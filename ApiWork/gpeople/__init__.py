@@ -1,116 +1,244 @@
-import os.path
-import base64
-from email.message import EmailMessage
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+import logging
+import os
+import re
+import time
+import bisect
+import difflib
+import threading
 from googleapiclient.errors import HttpError
 
-from ApiWork.utils import SCOPES
+from ApiWork.utils import build_service
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the contact directory pulls incremental changes again
+CONTACTS_TTL = int(os.getenv("CONTACTS_TTL", "300"))
+# Most contacts get_contacts returns; the best matches come first
+CONTACTS_MAX_RESULTS = int(os.getenv("CONTACTS_MAX_RESULTS", "20"))
+# Person fields the directory reads, for the fields= parameter
+PERSON_FIELDS = "resourceName,names/displayName,emailAddresses/value,metadata/deleted"
 
 def get_services():
     """Returns the People services."""
-    creds = None
-    if os.path.exists("token.json"):
-        creds = Credentials.from_authorized_user_file("token.json", SCOPES)
-        if not set(SCOPES).issubset(set(creds.scopes or [])):
-            print("Existing token lacks required scopes, re-running OAuth flow...")
-            creds = None
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
+    return build_service("people", "v1")
+
+class ContactDirectory:
+    """
+    Process-wide, in-memory copy of the user's contacts and "other contacts".
+
+    The first lookup does a full paginated sync; after CONTACTS_TTL seconds the
+    next lookup pulls only the changes using the People API sync tokens.
+    Lookups are served from a token index over names and email addresses.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = CONTACTS_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._people = {}  # resourceName -> {'name', 'email', 'type', 'emails'}
+        self._sync_tokens = {'contact': None, 'other': None}
+        self._synced_at = None
+        self._index = _build_index({})
+
+    def search(self, people_service, query=None):
+        """Returns contacts matching query (all contacts if query is empty)."""
+        self.refresh(people_service)
+        index = self._index
+
+        query = (query or '').strip().lower()
+        # Full email addresses are indexed as a single token
+        terms = [query] if '@' in query else _tokenize(query)
+        if not terms:
+            return list(index['all'])
+
+        matches = None
+        for term in terms:
+            scores = _match_term(term, index)
+            if matches is None:
+                matches = scores
+            else:
+                matches = {name: max(score, matches[name]) for name, score in scores.items() if name in matches}
+            if not matches:
+                return []
+
+        # Contacts before other contacts, then alphabetical
+        rank = index['rank']
+        ranked = sorted(matches, key=lambda name: (matches[name], rank[name]))
+        return [index['entries'][name] for name in ranked]
+
+    def refresh(self, people_service, force=False):
+        """Syncs with the People API if the directory is older than the TTL."""
+        if not force and self._synced_at is not None and time.monotonic() - self._synced_at < self.ttl:
+            return
+        with self._lock:
+            # Another thread may have synced while we waited for the lock
+            if not force and self._synced_at is not None and time.monotonic() - self._synced_at < self.ttl:
+                return
+            people = dict(self._people)
+            try:
+                for kind in ('contact', 'other'):
+                    self._sync(people_service, kind, people)
+            except HttpError as error:
+                logger.warning("An error occurred syncing contacts: %s", error)
+                if self._synced_at is None:
+                    raise
+                return
+            # Swap in the new snapshot; readers never see a half-built index
+            self._people, self._index = people, _build_index(people)
+            self._synced_at = time.monotonic()
+
+    def _sync(self, people_service, kind, people):
+        sync_token = self._sync_tokens[kind]
+        try:
+            changes, next_sync_token = _list_all(people_service, kind, sync_token)
+        except HttpError as error:
+            # Sync tokens expire after 7 days; fall back to a full sync
+            if sync_token is None or error.resp.status not in (400, 410):
+                raise
+            logger.info("Contact sync token for %s expired, running a full sync", kind)
+            sync_token = None
+            changes, next_sync_token = _list_all(people_service, kind, None)
+
+        if sync_token is None:
+            for name in [name for name, person in people.items() if person['type'] == kind]:
+                del people[name]
+
+        for person in changes:
+            resource_name = person.get('resourceName')
+            if person.get('metadata', {}).get('deleted'):
+                people.pop(resource_name, None)
+                continue
+            entry = _to_entry(person, kind)
+            if entry:
+                people[resource_name] = entry
+            else:
+                people.pop(resource_name, None)
+
+        self._sync_tokens[kind] = next_sync_token
+
+def _list_all(people_service, kind, sync_token):
+    """Pages through connections or otherContacts. Returns (people, next_sync_token)."""
+    results = []
+    page_token = None
+    while True:
+        if kind == 'contact':
+            response = people_service.people().connections().list(
+                resourceName='people/me',
+                pageSize=1000,
+                personFields='names,emailAddresses,metadata',
+                requestSyncToken=True,
+                syncToken=sync_token,
+                pageToken=page_token,
+                fields=f"connections({PERSON_FIELDS}),nextPageToken,nextSyncToken"
+            ).execute()
+            results.extend(response.get('connections', []))
         else:
-            flow = InstalledAppFlow.from_client_secrets_file(
-                "ApiWork/credentials.json", SCOPES
-            )
-            creds = flow.run_local_server(port=0)
-        # Save the credentials for the next run
-        with open("token.json", "w") as token:
-            token.write(creds.to_json())
+            response = people_service.otherContacts().list(
+                pageSize=1000,
+                readMask='names,emailAddresses,metadata',
+                requestSyncToken=True,
+                syncToken=sync_token,
+                pageToken=page_token,
+                fields=f"otherContacts({PERSON_FIELDS}),nextPageToken,nextSyncToken"
+            ).execute()
+            results.extend(response.get('otherContacts', []))
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return results, response.get('nextSyncToken')
 
-    try:
-        people_service = build("people", "v1", credentials=creds)
-        return people_service
-    except HttpError as error:
-        print(f"An error occurred: {error}")
+
+def _to_entry(person, kind):
+    names = person.get('names', [])
+    emails = [e.get('value') for e in person.get('emailAddresses', []) if e.get('value')]
+    if not emails:
         return None
+    if names:
+        name = names[0].get('displayName')
+    elif kind == 'other':
+        name = 'Unknown'
+    else:
+        # Saved contacts without a name were never returned
+        return None
+    return {'name': name, 'email': emails[0], 'type': kind, 'emails': emails}
+
+
+def _tokenize(text):
+    return [token for token in re.split(r'[^0-9a-z]+', text.lower()) if token]
+
+
+def _email_tokens(email):
+    email = email.lower()
+    return [email] + _tokenize(email)
+
+
+def _build_index(people):
+    entries = {
+        name: {'name': person['name'], 'email': person['email'], 'type': person['type']}
+        for name, person in people.items()
+    }
+    ordered = sorted(people, key=lambda name: (people[name]['type'] != 'contact', people[name]['name'].lower()))
+
+    tokens = {}  # token -> set of resourceNames
+    for name, person in people.items():
+        for token in _tokenize(person['name']) + [t for email in person['emails'] for t in _email_tokens(email)]:
+            tokens.setdefault(token, set()).add(name)
+
+    # Fuzzy candidates are bucketed by first letter to keep typo matching cheap
+    by_initial = {}
+    for token in tokens:
+        by_initial.setdefault(token[0], []).append(token)
+
+    return {
+        'entries': entries,
+        'all': [entries[name] for name in ordered],
+        'rank': {name: position for position, name in enumerate(ordered)},
+        'tokens': tokens,
+        'sorted_tokens': sorted(tokens),
+        'by_initial': by_initial,
+    }
 
-def get_contacts(people_service, query=None):
+
+def _match_term(term, index):
+    """
+    Scores every contact matching a single query term:
+    0 exact token, 1 token prefix, 2 fuzzy (typo) match.
+    """
+    tokens, sorted_tokens = index['tokens'], index['sorted_tokens']
+    scores = {}
+    # Prefix matches form a contiguous run in the sorted token list
+    position = bisect.bisect_left(sorted_tokens, term)
+    while position < len(sorted_tokens) and sorted_tokens[position].startswith(term):
+        token = sorted_tokens[position]
+        score = 0 if token == term else 1
+        for name in tokens[token]:
+            scores[name] = min(score, scores.get(name, score))
+        position += 1
+
+    if not scores and len(term) >= 3:
+        candidates = [t for t in index['by_initial'].get(term[0], []) if abs(len(t) - len(term)) <= 2]
+        for token in difflib.get_close_matches(term, candidates, n=5, cutoff=0.75):
+            for name in tokens[token]:
+                scores[name] = 2
+    return scores
+
+
+DIRECTORY = ContactDirectory()
+
+
+def get_contacts(people_service, query=None, max_results=CONTACTS_MAX_RESULTS):
     """
     Gets contacts and recommended recipients (other contacts).
     
     Args:
         people_service: The People API service instance.
-        query (str): Optional search query to filter contacts.
+        query (str): Optional search query to filter contacts. Matches name and
+            email words by prefix, falling back to fuzzy matching for typos.
+        max_results (int): Max number of contacts to return, best matches first.
     
     Returns:
         list: List of contact dictionaries with name, email, type.
     """
-    contacts = []
-    
     try:
-        # Get 'connections' (my contacts)
-        results = people_service.people().connections().list(
-            resourceName='people/me',
-            pageSize=100,
-            personFields='names,emailAddresses'
-        ).execute()
-        connections = results.get('connections', [])
-        
-        for person in connections:
-            names = person.get('names', [])
-            emails = person.get('emailAddresses', [])
-            if names and emails:
-                name = names[0].get('displayName')
-                email = emails[0].get('value')
-                
-                # Filter if query is provided
-                if query:
-                    if query.lower() in name.lower() or query.lower() in email.lower():
-                        contacts.append({
-                            'name': name,
-                            'email': email,
-                            'type': 'contact'
-                        })
-                else:
-                    contacts.append({
-                        'name': name,
-                        'email': email,
-                        'type': 'contact'
-                    })
-
-        # Get 'other contacts' (frequently contacted)
-        # Note: searchContacts is better but requires different setup, so we filter locally for now
-        other_results = people_service.otherContacts().list(
-            pageSize=100,
-            readMask='names,emailAddresses'
-        ).execute()
-        other_contacts = other_results.get('otherContacts', [])
-        
-        for person in other_contacts:
-            names = person.get('names', [])
-            emails = person.get('emailAddresses', [])
-            if emails:
-                 name = names[0].get('displayName') if names else 'Unknown'
-                 email = emails[0].get('value')
-                 
-                 # Filter if query is provided
-                 if query:
-                     if query.lower() in name.lower() or query.lower() in email.lower():
-                        contacts.append({
-                            'name': name,
-                            'email': email,
-                            'type': 'other'
-                        })
-                 else:
-                     contacts.append({
-                        'name': name,
-                        'email': email,
-                        'type': 'other'
-                    })
-                
-        return contacts
+        return DIRECTORY.search(people_service, query)[:max_results]
     except HttpError as error:
-        print(f"An error occurred fetching contacts: {error}")
-        return []
\ No newline at end of file
+        logger.warning("An error occurred fetching contacts: %s", error)
+        return []
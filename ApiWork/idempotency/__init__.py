@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import collections
+
+from ApiWork.utils import SQLiteConnections
+
+# "sqlite" lets a retry that lands on another worker find the original run
+IDEMPOTENCY_STORE = os.getenv("IDEMPOTENCY_STORE", "sqlite")
+IDEMPOTENCY_STORE_PATH = os.getenv("IDEMPOTENCY_STORE_PATH", "idempotency.db")
+# Finished responses are replayed for this long
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "600"))
+# At most this many finished responses are kept; the oldest go first
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "256"))
+# A run still unfinished after this long is treated as abandoned (e.g. its worker died)
+# and a retry takes it over. By default the item timeout plus a margin for the model
+# round trips and cache setup around the items
+IDEMPOTENCY_STALE_AFTER = float(
+    os.getenv("IDEMPOTENCY_STALE_AFTER", float(os.getenv("ATTENTION_ITEM_TIMEOUT", "90")) + 60)
+)
+# How often a retry checks on the run it is waiting for
+IDEMPOTENCY_POLL_INTERVAL = 0.5
+
+def request_key(session_id, messages, indices, mode, message_count=None):
+    """
+    Identifies a /GetTodos request by its session, transcript, attention indices
+    and mode. For a session delta, messages is just the delta and message_count
+    the session's length after it; sessions only grow, so together they stand
+    for the whole transcript without hashing it.
+    """
+    payload = json.dumps([session_id, messages, indices, mode, message_count], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class RequestStore:
+    """
+    Results of /GetTodos runs by request_key, so a retried request is answered
+    once. claim(key) returns one of:
+
+        ("claimed", None)   the caller runs the request, then calls complete()
+        ("running", None)   another caller is running it; wait() and claim again
+        ("done", context)   the stored response context
+
+    Only successful responses are kept; complete() with an error, or with
+    FailedItems (e.g. timed out items), releases the key and the next retry
+    runs the request again.
+    """
+
+    def claim(self, key):
+        raise NotImplementedError
+
+    def complete(self, key, context):
+        raise NotImplementedError
+
+    def wait(self, key, timeout):
+        """Blocks for up to timeout seconds, or until the key's run finishes."""
+        time.sleep(timeout)
+
+def _succeeded(context):
+    return context.get("Status") == 200 and not context.get("FailedItems")
+
+class MemoryRequestStore(RequestStore):
+    """Dict-backed store; retries are only matched within one worker process."""
+
+    def __init__(self, max_entries=IDEMPOTENCY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = collections.OrderedDict()  # key -> (status, started or finished, context)
+        self._changed = threading.Condition()
+
+    def _evict(self, now):
+        for key, (status, stamp, _) in list(self._entries.items()):
+            limit = IDEMPOTENCY_TTL if status == "done" else IDEMPOTENCY_STALE_AFTER
+            if stamp < now - limit:
+                del self._entries[key]
+        done = [key for key, entry in self._entries.items() if entry[0] == "done"]
+        for key in done[:max(0, len(done) - self.max_entries)]:
+            del self._entries[key]
+
+    def claim(self, key):
+        with self._changed:
+            now = time.time()
+            self._evict(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = ("running", now, None)
+                return "claimed", None
+            status, _, context = entry
+            return status, None if context is None else json.loads(context)
+
+    def complete(self, key, context):
+        with self._changed:
+            if _succeeded(context):
+                self._entries[key] = ("done", time.time(), json.dumps(context))
+                self._entries.move_to_end(key)
+            else:
+                self._entries.pop(key, None)
+            self._changed.notify_all()
+
+    def wait(self, key, timeout):
+        with self._changed:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == "running":
+                self._changed.wait(timeout)
+
+class SQLiteRequestStore(RequestStore):
+    """SQLite store in WAL mode, shared by every worker on the host."""
+
+    def __init__(self, path, max_entries=IDEMPOTENCY_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._connections = SQLiteConnections(path)
+        with self._connections.get() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS requests (
+                    key TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    updated REAL NOT NULL,
+                    context TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_requests_updated ON requests (status, updated);
+            """)
+
+    def claim(self, key):
+        now = time.time()
+        with self._connections.get() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "DELETE FROM requests WHERE (status = 'done' AND updated < ?) OR (status = 'running' AND updated < ?)",
+                (now - IDEMPOTENCY_TTL, now - IDEMPOTENCY_STALE_AFTER)
+            )
+            row = conn.execute("SELECT status, context FROM requests WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                conn.execute("INSERT INTO requests (key, status, updated) VALUES (?, 'running', ?)", (key, now))
+                return "claimed", None
+            status, context = row
+            return status, None if context is None else json.loads(context)
+
+    def complete(self, key, context):
+        with self._connections.get() as conn:
+            if not _succeeded(context):
+                conn.execute("DELETE FROM requests WHERE key = ?", (key,))
+                return
+            conn.execute(
+                "UPDATE requests SET status = 'done', updated = ?, context = ? WHERE key = ?",
+                (time.time(), json.dumps(context), key)
+            )
+            conn.execute(
+                "DELETE FROM requests WHERE key IN ("
+                "SELECT key FROM requests WHERE status = 'done' ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+def get_request_store():
+    """Returns the store selected by IDEMPOTENCY_STORE."""
+    if IDEMPOTENCY_STORE == "memory":
+        return MemoryRequestStore()
+    if IDEMPOTENCY_STORE == "sqlite":
+        return SQLiteRequestStore(IDEMPOTENCY_STORE_PATH)
+    raise ValueError(f"Unknown IDEMPOTENCY_STORE: {IDEMPOTENCY_STORE}")
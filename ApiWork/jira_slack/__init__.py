@@ -1,8 +1,13 @@
-from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 from jira import JIRA
 import os
+import logging
 from dotenv import load_dotenv
+
+from ApiWork.transport import HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, get_session, share_pool
+
+logger = logging.getLogger(__name__)
+
 load_dotenv(override=True)
 SLACK_API_TOKEN = os.getenv("SLACK_API_TOKEN")
 JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN")
@@ -10,9 +15,35 @@ JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN")
 JIRA_SERVER = 'https://grantow.atlassian.net'
 JIRA_USER = 'grantow@umich.edu'
 
+SLACK_API_URL = "https://slack.com/api/"
+
+class SlackClient:
+    """
+    The Slack Web API methods the app uses, sent over the shared transport
+    session (slack_sdk's WebClient opens a new urllib connection per call).
+    Errors are raised as SlackApiError like WebClient does.
+    """
+
+    def __init__(self, token):
+        self.token = token
+
+    def api_call(self, method, payload):
+        url = SLACK_API_URL + method
+        response = get_session().post(url, json=payload, headers={"Authorization": f"Bearer {self.token}"})
+        try:
+            data = response.json()
+        except ValueError:
+            data = {"ok": False, "error": f"HTTP {response.status_code}"}
+        if not data.get("ok"):
+            raise SlackApiError(f"The request to the Slack API failed. (url: {url})", data)
+        return data
+
+    def chat_postMessage(self, channel, text):
+        return self.api_call("chat.postMessage", {"channel": channel, "text": text})
+
 # returns the slack web client
 def get_slack_client():
-    return WebClient(token=SLACK_API_TOKEN)
+    return SlackClient(SLACK_API_TOKEN)
 
 def propose_send_slack_message(message):
     return {
@@ -32,15 +63,19 @@ def execute_send_slack_message(client, data):
         )
         return {"status": "success", "ts": response['ts']}
     except SlackApiError as e:
-        print(f"Error sending message: {e}")
+        logger.warning("Error sending message: %s", e)
         return {"status": "error", "message": str(e)}
 
 # returns the jira web client
 def get_jira_client():
-    return JIRA(
+    client = JIRA(
         options={'server': JIRA_SERVER},
-        basic_auth=(JIRA_USER, JIRA_API_TOKEN)
+        basic_auth=(JIRA_USER, JIRA_API_TOKEN),
+        timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
     )
+    # JIRA keeps its session private; route it through the shared connection pools
+    share_pool(client._session)
+    return client
 
 def propose_create_jira_issue(summary, description):
     return {
@@ -60,6 +95,6 @@ def execute_create_jira_issue(client, data):
                                 description=description, issuetype={'id': 10001})
         return {"status": "success", "key": new_issue.key, "id": new_issue.id}
     except Exception as e:
-        print(f"Error creating issue: {e}")
+        logger.warning("Error creating issue: %s", e)
         return {"status": "error", "message": str(e)}
 
@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import datetime
+import threading
+
+from ApiWork.utils import SQLiteConnections
+
+# "sqlite" lets any worker answer GET /jobs/<id>; "memory" only the worker running the job
+JOB_STORE = os.getenv("JOB_STORE", "sqlite")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.db")
+# Finished jobs are kept this long for clients to collect them
+JOB_TTL = int(os.getenv("JOB_TTL", "3600"))
+
+class JobStore:
+    """
+    Interface for background /GetTodos jobs. A job is a dict
+    { id, status, created_at, finished_at, Todos, FailedItems, Error }, where
+    status moves from queued to running to done or failed. Todos grows while
+    the job runs, so clients can show actions before it finishes.
+    """
+
+    def create(self, job_id):
+        raise NotImplementedError
+
+    def get(self, job_id):
+        """Returns the job or None."""
+        raise NotImplementedError
+
+    def set_status(self, job_id, status):
+        raise NotImplementedError
+
+    def add_action(self, job_id, action):
+        """
+        Adds a proposed action to a running job's Todos. A duplicate merged into
+        an earlier action comes back with the same uuid and replaces it.
+        """
+        raise NotImplementedError
+
+    def finish(self, job_id, context):
+        """Stores the final /GetTodos response context; its Status decides done or failed."""
+        raise NotImplementedError
+
+def _new_job(job_id):
+    return {
+        "id": job_id,
+        "status": "queued",
+        "created_at": str(datetime.datetime.now()),
+        "finished_at": None,
+        "Todos": [],
+        "FailedItems": [],
+        "Error": "",
+    }
+
+def _finished(job, context):
+    job = dict(job)
+    job["status"] = "done" if context.get("Status") == 200 else "failed"
+    job["finished_at"] = str(datetime.datetime.now())
+    job["Todos"] = context.get("Todos", job["Todos"])
+    job["FailedItems"] = context.get("FailedItems", [])
+    job["Error"] = context.get("Error", "")
+    return job
+
+class MemoryJobStore(JobStore):
+    """Dict-backed store; only visible inside one worker process."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._created = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id):
+        with self._lock:
+            cutoff = time.time() - JOB_TTL
+            for old_id in [old_id for old_id, created in self._created.items() if created < cutoff]:
+                self._jobs.pop(old_id, None)
+                del self._created[old_id]
+            self._jobs[job_id] = _new_job(job_id)
+            self._created[job_id] = time.time()
+            return dict(self._jobs[job_id])
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return None if job is None else {**job, "Todos": list(job["Todos"])}
+
+    def set_status(self, job_id, status):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id]["status"] = status
+
+    def add_action(self, job_id, action):
+        with self._lock:
+            if job_id not in self._jobs:
+                return
+            todos = self._jobs[job_id]["Todos"]
+            for position, existing in enumerate(todos):
+                if existing.get("uuid") == action.get("uuid"):
+                    todos[position] = action
+                    return
+            todos.append(action)
+
+    def finish(self, job_id, context):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id] = _finished(self._jobs[job_id], context)
+
+class SQLiteJobStore(JobStore):
+    """SQLite store in WAL mode, shared by every worker on the host."""
+
+    def __init__(self, path):
+        self.path = path
+        self._connections = SQLiteConnections(path)
+        with self._connections.get() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    body TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created);
+            """)
+
+    def create(self, job_id):
+        job = _new_job(job_id)
+        with self._connections.get() as conn:
+            conn.execute("DELETE FROM jobs WHERE created < ?", (time.time() - JOB_TTL,))
+            conn.execute(
+                "INSERT INTO jobs (id, status, created, body) VALUES (?, ?, ?, ?)",
+                (job_id, job["status"], time.time(), json.dumps(job))
+            )
+        return job
+
+    def get(self, job_id):
+        row = self._connections.get().execute("SELECT body FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_status(self, job_id, status):
+        with self._connections.get() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, body = json_set(body, '$.status', ?) WHERE id = ?",
+                (status, status, job_id)
+            )
+
+    def add_action(self, job_id, action):
+        with self._connections.get() as conn:
+            # Written in place, without reading the job back
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT todo.key FROM jobs, json_each(jobs.body, '$.Todos') AS todo "
+                "WHERE jobs.id = ? AND json_extract(todo.value, '$.uuid') = ?",
+                (job_id, action.get("uuid"))
+            ).fetchone()
+            path = "$.Todos[#]" if row is None else f"$.Todos[{row[0]}]"
+            conn.execute(
+                "UPDATE jobs SET body = json_set(body, ?, json(?)) WHERE id = ?",
+                (path, json.dumps(action), job_id)
+            )
+
+    def finish(self, job_id, context):
+        with self._connections.get() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT body FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            job = _finished(json.loads(row[0]), context)
+            conn.execute("UPDATE jobs SET status = ?, body = ? WHERE id = ?", (job["status"], json.dumps(job), job_id))
+
+def get_job_store():
+    """Returns the store selected by JOB_STORE."""
+    if JOB_STORE == "memory":
+        return MemoryJobStore()
+    if JOB_STORE == "sqlite":
+        return SQLiteJobStore(JOB_STORE_PATH)
+    raise ValueError(f"Unknown JOB_STORE: {JOB_STORE}")
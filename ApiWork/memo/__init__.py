@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import inspect
+import weakref
+import functools
+import threading
+import contextvars
+import collections
+from concurrent.futures import Future
+
+# "request" shares lookups within one /GetTodos call; "session" keeps them
+# across calls with the same session_id for MEMO_TTL seconds
+MEMO_SCOPE = os.getenv("MEMO_SCOPE", "request")
+MEMO_TTL = int(os.getenv("MEMO_TTL", "120"))
+# Session caches kept per worker
+MEMO_SESSIONS = 64
+
+_current = contextvars.ContextVar("memo_cache", default=None)
+_live_caches = weakref.WeakSet()
+_session_caches = collections.OrderedDict()
+_registry_lock = threading.Lock()
+
+_stats = collections.defaultdict(lambda: {"hits": 0, "misses": 0})
+_stats_lock = threading.Lock()
+
+class MemoCache:
+    """
+    Results of read-only tool calls, keyed by tool and normalized arguments.
+    Concurrent identical calls share one Future, so only the first one runs.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def call(self, service, key, func):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[2] > self.ttl:
+                entry = None
+            owner = entry is None
+            if owner:
+                entry = (service, Future(), time.monotonic())
+                self._entries[key] = entry
+        _count(key[0], "misses" if owner else "hits")
+
+        future = entry[1]
+        if owner:
+            try:
+                future.set_result(func())
+            except BaseException as error:
+                # Waiters see the error, but the next call tries again
+                future.set_exception(error)
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+        return future.result()
+
+    def invalidate(self, service):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[0] == service]:
+                del self._entries[key]
+
+def memoized(service):
+    """
+    Decorator for read tools backed by service. Calls made inside a scope()
+    are served from its cache; outside one the tool runs as usual.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = _current.get()
+            if cache is None:
+                return func(*args, **kwargs)
+            key = (func.__name__, _normalize(signature, args, kwargs))
+            return cache.call(service, key, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+class scope:
+    """
+    Context manager that makes tool calls in this context (and in threads or
+    tasks started with a copy of it) share a cache. With MEMO_SCOPE=session and
+    a session_id, the cache is reused by later requests of the session.
+    """
+
+    def __init__(self, session_id=None):
+        self.session_id = session_id if MEMO_SCOPE == "session" else None
+
+    def __enter__(self):
+        if self.session_id:
+            cache = _session_cache(self.session_id)
+        else:
+            cache = MemoCache()
+            with _registry_lock:
+                _live_caches.add(cache)
+        self._token = _current.set(cache)
+        return cache
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        return False
+
+def invalidate(service):
+    """Drops cached reads of service from every live cache, e.g. after a write."""
+    with _registry_lock:
+        caches = list(_live_caches)
+    for cache in caches:
+        cache.invalidate(service)
+
+def stats():
+    """Hit and miss counts per tool since the worker started."""
+    with _stats_lock:
+        return {name: dict(counts) for name, counts in _stats.items()}
+
+def _session_cache(session_id):
+    with _registry_lock:
+        cache = _session_caches.pop(session_id, None)
+        if cache is None:
+            cache = MemoCache(ttl=MEMO_TTL)
+            _live_caches.add(cache)
+        _session_caches[session_id] = cache
+        while len(_session_caches) > MEMO_SESSIONS:
+            _session_caches.popitem(last=False)
+    return cache
+
+def _normalize(signature, args, kwargs):
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    normalized = {}
+    for name, value in bound.arguments.items():
+        if isinstance(value, str):
+            value = value.strip().lower() or None
+        if value is not None:
+            normalized[name] = value
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+def _count(name, kind):
+    with _stats_lock:
+        _stats[name][kind] += 1
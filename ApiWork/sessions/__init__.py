@@ -0,0 +1,217 @@
+import os
+import time
+import threading
+import collections
+import collections.abc
+
+from ApiWork.context import format_turn
+from ApiWork.utils import SQLiteConnections
+
+# "sqlite" lets any worker continue a session; "memory" keeps sessions in the worker
+SESSION_STORE = os.getenv("SESSION_STORE", "sqlite")
+SESSION_STORE_PATH = os.getenv("SESSION_STORE_PATH", "sessions.db")
+# Sessions untouched for this long are dropped
+SESSION_TTL = int(os.getenv("SESSION_TTL", str(6 * 3600)))
+# Rendered transcripts kept in memory per worker (SQLite store only)
+SESSION_CACHE_SIZE = 64
+
+class OffsetMismatch(Exception):
+    """A delta does not line up with the stored transcript; the client should resend from expected."""
+
+    def __init__(self, expected):
+        super().__init__(f"Session has {expected} messages; resend starting at offset {expected}")
+        self.expected = expected
+
+class Prefix(collections.abc.Sequence):
+    """
+    Read-only view of the first length items of a list that is only ever
+    appended to, so taking one is O(1) and later appends don't show through.
+    """
+
+    def __init__(self, items, length):
+        self._items = items
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._items[i] for i in range(self._length)[index]]
+        return self._items[range(self._length)[index]]
+
+# What append returns: Prefix views of a session's messages and rendered lines, and its text
+SessionSnapshot = collections.namedtuple("SessionSnapshot", ["messages", "lines", "text"])
+
+class SessionView:
+    """
+    A session's transcript plus its derived state: every message, each rendered
+    transcript line and the joined transcript text, all extended in place as
+    deltas arrive so appending n messages costs O(n).
+    """
+
+    def __init__(self):
+        self.reset()
+        self.touched = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reset(self):
+        """
+        Empties the transcript; the lock is kept, so callers holding it stay safe.
+        New lists are started rather than cleared, so earlier snapshots stay valid.
+        """
+        self.messages = []
+        self.lines = []
+        self.text = "Full Conversation Transcript:"
+
+    def extend(self, messages):
+        start = len(self.messages)
+        new_lines = [format_turn(start + i, message) for i, message in enumerate(messages)]
+        self.messages.extend(messages)
+        self.lines.extend(new_lines)
+        if new_lines:
+            self.text += "\n" + "\n".join(new_lines)
+        self.touched = time.monotonic()
+
+    def snapshot(self):
+        """The transcript as of now, unaffected by later appends. Call with the lock held."""
+        return SessionSnapshot(
+            Prefix(self.messages, len(self.messages)), Prefix(self.lines, len(self.lines)), self.text
+        )
+
+class SessionStore:
+    """
+    Per-session transcript storage keyed by session_id. Clients send only new
+    messages with the offset of the first one; overlapping messages (a resent
+    delta) are skipped, and a gap raises OffsetMismatch.
+    """
+
+    def append(self, session_id, offset, messages):
+        """Adds messages starting at offset and returns a SessionSnapshot of the session."""
+        raise NotImplementedError
+
+def _new_part(offset, messages, current):
+    # Messages before `current` are already stored (e.g. a retried delta)
+    if offset > current:
+        raise OffsetMismatch(current)
+    return messages[current - offset:]
+
+class MemorySessionStore(SessionStore):
+    """Sessions live in this worker only."""
+
+    def __init__(self):
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def append(self, session_id, offset, messages):
+        with self._lock:
+            self._evict_idle()
+            view = self._views.setdefault(session_id, SessionView())
+        with view.lock:
+            view.extend(_new_part(offset, messages, len(view.messages)))
+            return view.snapshot()
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - SESSION_TTL
+        for session_id in [sid for sid, view in self._views.items() if view.touched < cutoff]:
+            del self._views[session_id]
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Messages are stored in SQLite so a session can continue on any worker. Each
+    worker keeps an LRU of rendered SessionViews and only reads the messages
+    other workers appended since it last saw the session.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connections = SQLiteConnections(path)
+        self._views = collections.OrderedDict()
+        self._lock = threading.Lock()
+        with self._connections.get() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    message_count INTEGER NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at);
+                CREATE TABLE IF NOT EXISTS session_messages (
+                    session_id TEXT NOT NULL,
+                    idx INTEGER NOT NULL,
+                    speaker TEXT,
+                    content TEXT,
+                    PRIMARY KEY (session_id, idx)
+                );
+            """)
+
+    def _view(self, session_id):
+        with self._lock:
+            view = self._views.pop(session_id, None) or SessionView()
+            self._views[session_id] = view
+            while len(self._views) > SESSION_CACHE_SIZE:
+                self._views.popitem(last=False)
+        return view
+
+    def append(self, session_id, offset, messages):
+        view = self._view(session_id)
+        with view.lock:
+            conn = self._connections.get()
+            with conn:
+                # BEGIN IMMEDIATE serializes appends to the database across workers
+                conn.execute("BEGIN IMMEDIATE")
+                row = conn.execute("SELECT message_count FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                stored = row[0] if row else 0
+                if stored < len(view.messages):
+                    # The session expired and was recreated; start over
+                    view.reset()
+                if stored > len(view.messages):
+                    # Catch up with what other workers appended
+                    rows = conn.execute(
+                        "SELECT speaker, content FROM session_messages WHERE session_id = ? AND idx >= ? ORDER BY idx",
+                        (session_id, len(view.messages))
+                    ).fetchall()
+                    view.extend([_from_row(speaker, content) for speaker, content in rows])
+
+                new_messages = _new_part(offset, messages, stored)
+                conn.executemany(
+                    "INSERT INTO session_messages (session_id, idx, speaker, content) VALUES (?, ?, ?, ?)",
+                    [
+                        (session_id, stored + i, _to_column(message.get("speaker")), message.get("content", ""))
+                        for i, message in enumerate(new_messages)
+                    ]
+                )
+                conn.execute(
+                    "INSERT INTO sessions (session_id, message_count, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT (session_id) DO UPDATE SET message_count = excluded.message_count, updated_at = excluded.updated_at",
+                    (session_id, stored + len(new_messages), time.time())
+                )
+                if row is None:
+                    self._delete_expired(conn)
+            view.extend(new_messages)
+            return view.snapshot()
+
+    def _delete_expired(self, conn):
+        cutoff = time.time() - SESSION_TTL
+        conn.execute(
+            "DELETE FROM session_messages WHERE session_id IN (SELECT session_id FROM sessions WHERE updated_at < ?)",
+            (cutoff,)
+        )
+        conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+
+def _to_column(speaker):
+    return None if speaker is None else str(speaker)
+
+def _from_row(speaker, content):
+    message = {"content": content}
+    if speaker is not None:
+        message["speaker"] = int(speaker) if speaker.lstrip("-").isdigit() else speaker
+    return message
+
+def get_session_store():
+    """Returns the store selected by SESSION_STORE."""
+    if SESSION_STORE == "memory":
+        return MemorySessionStore()
+    if SESSION_STORE == "sqlite":
+        return SQLiteSessionStore(SESSION_STORE_PATH)
+    raise ValueError(f"Unknown SESSION_STORE: {SESSION_STORE}")
@@ -0,0 +1,425 @@
+import os
+import json
+import time
+import threading
+import collections
+
+from ApiWork.utils import SQLiteConnections
+
+# "sqlite" shares proposed actions between gunicorn workers and restarts;
+# "memory" keeps them in the worker process (single-worker development)
+ACTION_STORE = os.getenv("ACTION_STORE", "sqlite")
+ACTION_STORE_PATH = os.getenv("ACTION_STORE_PATH", "actions.db")
+# Number of recent changes kept for clients catching up with changes_since
+CHANGE_LOG_SIZE = 1000
+# An action still "executing" after this many seconds was abandoned (e.g. its worker was killed)
+EXECUTING_STALE_AFTER = int(os.getenv("EXECUTING_STALE_AFTER", "600"))
+
+class ActionStore:
+    """
+    Interface for proposed-action storage. Actions are the dicts built by
+    add_proposed_action: { uuid, data, status, created_at, ... }.
+
+    Every write bumps a version counter and is recorded in a change log
+    ({version, kind, uuid, action}), where kind is created, updated, deleted
+    or executed. Clients use the version as an ETag and the log for deltas.
+    """
+
+    def __init__(self):
+        self._changed = threading.Condition()
+
+    def add(self, action_obj):
+        raise NotImplementedError
+
+    def add_unique(self, action_obj, merge_duplicate):
+        """
+        Adds action_obj unless it duplicates a pending action with the same
+        dedup_key. merge_duplicate(candidate) returns the merged action to store
+        in place of candidate, or None if candidate is not a duplicate. The
+        lookup and write are atomic. Returns the action that was stored.
+        """
+        raise NotImplementedError
+
+    def get(self, action_id):
+        """Returns the action or None."""
+        raise NotImplementedError
+
+    def list(self, status=None):
+        """Returns actions ordered by creation time, optionally filtered by status."""
+        raise NotImplementedError
+
+    def update(self, action_id, data, expected="pending"):
+        """
+        Replaces an action's data, only while the action has the expected status,
+        so an edit can never undo a concurrent claim. Returns False if the action
+        does not exist or no longer has that status.
+        """
+        raise NotImplementedError
+
+    def set_status(self, action_id, status, expected=None):
+        """
+        Changes an action's status, only if it currently has the expected status
+        when one is given, and stamps status_since. Returns True if the action
+        was changed.
+        """
+        raise NotImplementedError
+
+    def release_stale(self, status="executing", older_than=EXECUTING_STALE_AFTER):
+        """
+        Puts actions that have had status for more than older_than seconds back
+        to pending. Returns their ids.
+        """
+        raise NotImplementedError
+
+    def delete(self, action_id, kind="deleted"):
+        """Returns False if the action did not exist. kind is recorded in the change log."""
+        raise NotImplementedError
+
+    def delete_many(self, action_ids, kind="deleted"):
+        """Deletes several actions in one write. Returns the ids that existed."""
+        raise NotImplementedError
+
+    def count(self, status=None):
+        raise NotImplementedError
+
+    def version(self):
+        """Version of the latest change; 0 for an empty store."""
+        raise NotImplementedError
+
+    def changes_since(self, version):
+        """
+        Changes after version, oldest first. Returns None if some of them were
+        already dropped from the log, or version is newer than the store's (e.g.
+        an id from before a restart), and the client has to reload everything.
+        """
+        raise NotImplementedError
+
+    def wait_for_change(self, version, timeout):
+        """
+        Blocks until a change after version is made in this process, or timeout
+        seconds pass. Other workers' writes are only seen once the caller checks
+        again, so callers should use a short timeout and loop.
+        """
+        with self._changed:
+            if self.version() <= version:
+                self._changed.wait(timeout)
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+class MemoryActionStore(ActionStore):
+    """Dict-backed store; only visible inside one worker process."""
+
+    def __init__(self):
+        super().__init__()
+        self._actions = {}
+        self._lock = threading.Lock()
+        self._version = 0
+        self._changes = collections.deque(maxlen=CHANGE_LOG_SIZE)
+
+    def _record(self, kind, action_id, action_obj):
+        # Called with self._lock held
+        self._version += 1
+        self._changes.append({"version": self._version, "kind": kind, "uuid": action_id, "action": action_obj})
+
+    def add(self, action_obj):
+        with self._lock:
+            self._actions[action_obj["uuid"]] = action_obj
+            self._record("created", action_obj["uuid"], action_obj)
+        self._notify()
+
+    def add_unique(self, action_obj, merge_duplicate):
+        with self._lock:
+            for candidate in self._actions.values():
+                if candidate.get("status") != "pending" or candidate.get("dedup_key") != action_obj.get("dedup_key"):
+                    continue
+                merged = merge_duplicate(candidate)
+                if merged is not None:
+                    self._actions[merged["uuid"]] = merged
+                    self._record("updated", merged["uuid"], merged)
+                    break
+            else:
+                merged = action_obj
+                self._actions[action_obj["uuid"]] = action_obj
+                self._record("created", action_obj["uuid"], action_obj)
+        self._notify()
+        return merged
+
+    def get(self, action_id):
+        return self._actions.get(action_id)
+
+    def list(self, status=None):
+        actions = list(self._actions.values())
+        if status is not None:
+            actions = [action for action in actions if action.get("status") == status]
+        return actions
+
+    def update(self, action_id, data, expected="pending"):
+        with self._lock:
+            action = self._actions.get(action_id)
+            if action is None or action.get("status") != expected:
+                return False
+            action["data"] = data
+            self._record("updated", action_id, action)
+        self._notify()
+        return True
+
+    def set_status(self, action_id, status, expected=None):
+        with self._lock:
+            action = self._actions.get(action_id)
+            if action is None or (expected is not None and action.get("status") != expected):
+                return False
+            action["status"] = status
+            action["status_since"] = time.time()
+            self._record("updated", action_id, action)
+        self._notify()
+        return True
+
+    def release_stale(self, status="executing", older_than=EXECUTING_STALE_AFTER):
+        cutoff = time.time() - older_than
+        released = []
+        with self._lock:
+            for action_id, action in self._actions.items():
+                if action.get("status") == status and action.get("status_since", 0) < cutoff:
+                    action["status"] = "pending"
+                    action["status_since"] = time.time()
+                    self._record("updated", action_id, action)
+                    released.append(action_id)
+        if released:
+            self._notify()
+        return released
+
+    def delete(self, action_id, kind="deleted"):
+        with self._lock:
+            if self._actions.pop(action_id, None) is None:
+                return False
+            self._record(kind, action_id, None)
+        self._notify()
+        return True
+
+    def delete_many(self, action_ids, kind="deleted"):
+        deleted = []
+        with self._lock:
+            for action_id in action_ids:
+                if self._actions.pop(action_id, None) is not None:
+                    self._record(kind, action_id, None)
+                    deleted.append(action_id)
+        if deleted:
+            self._notify()
+        return deleted
+
+    def count(self, status=None):
+        return len(self.list(status))
+
+    def version(self):
+        return self._version
+
+    def changes_since(self, version):
+        with self._lock:
+            changes = list(self._changes)
+        if version > self._version:
+            return None
+        if version < self._version and (not changes or changes[0]["version"] > version + 1):
+            return None
+        return [change for change in changes if change["version"] > version]
+
+class SQLiteActionStore(ActionStore):
+    """
+    SQLite store in WAL mode, shared by every worker on the host. Each action is
+    a JSON document plus indexed status and created_at columns.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._connections = SQLiteConnections(path)
+        with self._connections.get() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS actions (
+                    uuid TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at TEXT,
+                    body TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_actions_status_created ON actions (status, created_at);
+                CREATE INDEX IF NOT EXISTS idx_actions_created ON actions (created_at);
+                CREATE INDEX IF NOT EXISTS idx_actions_dedup ON actions (json_extract(body, '$.dedup_key'));
+                CREATE TABLE IF NOT EXISTS action_changes (
+                    version INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    uuid TEXT NOT NULL,
+                    body TEXT
+                );
+            """)
+
+    def _record(self, conn, kind, action_id):
+        # Runs inside the write's transaction so the change and the log never disagree
+        conn.execute(
+            "INSERT INTO action_changes (kind, uuid, body) "
+            "VALUES (?, ?, (SELECT body FROM actions WHERE uuid = ?))",
+            (kind, action_id, action_id)
+        )
+        conn.execute(
+            "DELETE FROM action_changes WHERE version <= (SELECT MAX(version) FROM action_changes) - ?",
+            (CHANGE_LOG_SIZE,)
+        )
+
+    def add(self, action_obj):
+        with self._connections.get() as conn:
+            conn.execute(
+                "INSERT INTO actions (uuid, status, created_at, body) VALUES (?, ?, ?, ?)",
+                (action_obj["uuid"], action_obj["status"], action_obj.get("created_at"), json.dumps(action_obj))
+            )
+            self._record(conn, "created", action_obj["uuid"])
+        self._notify()
+
+    def add_unique(self, action_obj, merge_duplicate):
+        with self._connections.get() as conn:
+            # Take the write lock up front so two workers cannot both miss the duplicate
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT body FROM actions WHERE json_extract(body, '$.dedup_key') = ? AND status = 'pending' "
+                "ORDER BY created_at, rowid",
+                (action_obj.get("dedup_key"),)
+            )
+            for (body,) in rows.fetchall():
+                merged = merge_duplicate(json.loads(body))
+                if merged is not None:
+                    conn.execute("UPDATE actions SET body = ? WHERE uuid = ?", (json.dumps(merged), merged["uuid"]))
+                    self._record(conn, "updated", merged["uuid"])
+                    break
+            else:
+                merged = action_obj
+                conn.execute(
+                    "INSERT INTO actions (uuid, status, created_at, body) VALUES (?, ?, ?, ?)",
+                    (action_obj["uuid"], action_obj["status"], action_obj.get("created_at"), json.dumps(action_obj))
+                )
+                self._record(conn, "created", action_obj["uuid"])
+        self._notify()
+        return merged
+
+    def get(self, action_id):
+        row = self._connections.get().execute("SELECT body FROM actions WHERE uuid = ?", (action_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self, status=None):
+        if status is None:
+            rows = self._connections.get().execute("SELECT body FROM actions ORDER BY created_at, rowid")
+        else:
+            rows = self._connections.get().execute(
+                "SELECT body FROM actions WHERE status = ? ORDER BY created_at, rowid", (status,)
+            )
+        return [json.loads(row[0]) for row in rows]
+
+    def update(self, action_id, data, expected="pending"):
+        with self._connections.get() as conn:
+            # Only data is written and the status is checked in the same statement
+            cursor = conn.execute(
+                "UPDATE actions SET body = json_set(body, '$.data', json(?)) WHERE uuid = ? AND status = ?",
+                (json.dumps(data), action_id, expected)
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._record(conn, "updated", action_id)
+        self._notify()
+        return True
+
+    def set_status(self, action_id, status, expected=None):
+        with self._connections.get() as conn:
+            # The status check and write happen in one statement, so two workers
+            # cannot both claim the same action
+            sql = "UPDATE actions SET status = ?, body = json_set(body, '$.status', ?, '$.status_since', ?) WHERE uuid = ?"
+            params = [status, status, time.time(), action_id]
+            if expected is not None:
+                sql += " AND status = ?"
+                params.append(expected)
+            cursor = conn.execute(sql, params)
+            if cursor.rowcount == 0:
+                return False
+            self._record(conn, "updated", action_id)
+        self._notify()
+        return True
+
+    def release_stale(self, status="executing", older_than=EXECUTING_STALE_AFTER):
+        now = time.time()
+        with self._connections.get() as conn:
+            # Few actions are ever executing, so this is a short scan of the status index;
+            # rows from before status_since existed count as stale
+            released = [row[0] for row in conn.execute(
+                "SELECT uuid FROM actions WHERE status = ? AND COALESCE(json_extract(body, '$.status_since'), 0) < ?",
+                (status, now - older_than)
+            ).fetchall()]
+            for action_id in list(released):
+                # Skip actions whose execution finished since the select
+                cursor = conn.execute(
+                    "UPDATE actions SET status = 'pending', "
+                    "body = json_set(body, '$.status', 'pending', '$.status_since', ?) WHERE uuid = ? AND status = ?",
+                    (now, action_id, status)
+                )
+                if cursor.rowcount:
+                    self._record(conn, "updated", action_id)
+                else:
+                    released.remove(action_id)
+        if released:
+            self._notify()
+        return released
+
+    def delete(self, action_id, kind="deleted"):
+        with self._connections.get() as conn:
+            cursor = conn.execute("DELETE FROM actions WHERE uuid = ?", (action_id,))
+            if cursor.rowcount == 0:
+                return False
+            self._record(conn, kind, action_id)
+        self._notify()
+        return True
+
+    def delete_many(self, action_ids, kind="deleted"):
+        deleted = []
+        with self._connections.get() as conn:
+            for action_id in action_ids:
+                if conn.execute("DELETE FROM actions WHERE uuid = ?", (action_id,)).rowcount:
+                    self._record(conn, kind, action_id)
+                    deleted.append(action_id)
+        if deleted:
+            self._notify()
+        return deleted
+
+    def count(self, status=None):
+        if status is None:
+            return self._connections.get().execute("SELECT COUNT(*) FROM actions").fetchone()[0]
+        return self._connections.get().execute("SELECT COUNT(*) FROM actions WHERE status = ?", (status,)).fetchone()[0]
+
+    def version(self):
+        return self._connections.get().execute("SELECT COALESCE(MAX(version), 0) FROM action_changes").fetchone()[0]
+
+    def changes_since(self, version):
+        conn = self._connections.get()
+        # One read transaction so the bounds and the rows come from the same snapshot
+        conn.execute("BEGIN")
+        try:
+            oldest, latest = conn.execute("SELECT MIN(version), MAX(version) FROM action_changes").fetchone()
+            if version > (latest or 0):
+                return None
+            if latest is None or latest == version:
+                return []
+            if oldest > version + 1:
+                return None
+            rows = conn.execute(
+                "SELECT version, kind, uuid, body FROM action_changes WHERE version > ? ORDER BY version",
+                (version,)
+            ).fetchall()
+        finally:
+            conn.commit()
+        return [
+            {"version": v, "kind": kind, "uuid": uuid, "action": json.loads(body) if body else None}
+            for v, kind, uuid, body in rows
+        ]
+
+def get_action_store():
+    """Returns the store selected by ACTION_STORE."""
+    if ACTION_STORE == "memory":
+        return MemoryActionStore()
+    if ACTION_STORE == "sqlite":
+        return SQLiteActionStore(ACTION_STORE_PATH)
+    raise ValueError(f"Unknown ACTION_STORE: {ACTION_STORE}")
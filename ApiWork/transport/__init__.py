@@ -0,0 +1,108 @@
+"""
+Shared HTTP transport for the Google, Jira and Slack integrations.
+
+One requests session per worker process, with one connection pool per host
+kept alive between calls, so each host costs one TLS handshake per connection
+instead of one per cold client. At most HTTP_MAX_CONNECTIONS_PER_HOST
+connections are open to a host; further calls wait for a free one. Responses
+are requested gzip-encoded and every call has connect and read timeouts.
+"""
+import os
+import threading
+
+import httplib2
+import requests
+from requests.adapters import HTTPAdapter
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+# Hosts whose pools are kept; the app talks to five or six
+HTTP_MAX_HOSTS = 16
+# Google only gzips responses for user agents that contain "gzip"
+USER_AGENT = "spartahacks-todos (gzip)"
+
+_adapter = None
+_session = None
+_lock = threading.Lock()
+
+class TimeoutSession(requests.Session):
+    """Session whose calls default to (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)."""
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+def get_adapter():
+    """The worker's connection pools, shared by every session that mounts them."""
+    global _adapter
+    with _lock:
+        if _adapter is None:
+            _adapter = HTTPAdapter(
+                pool_connections=HTTP_MAX_HOSTS,
+                pool_maxsize=HTTP_MAX_CONNECTIONS_PER_HOST,
+                pool_block=True,
+            )
+        return _adapter
+
+def share_pool(session):
+    """Routes a session created elsewhere (e.g. by a client library) through the shared pools."""
+    adapter = get_adapter()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_session():
+    """The worker's shared session."""
+    global _session
+    if _session is None:
+        session = share_pool(TimeoutSession())
+        session.headers.update({"Accept-Encoding": "gzip", "User-Agent": USER_AGENT})
+        with _lock:
+            if _session is None:
+                _session = session
+    return _session
+
+class SessionHttp:
+    """
+    httplib2.Http look-alike over the shared session, for googleapiclient and
+    google_auth_httplib2.AuthorizedHttp. Unlike httplib2.Http it is safe to
+    use from several threads at once.
+    """
+
+    def __init__(self, session=None):
+        self.session = session or get_session()
+        self.timeout = HTTP_READ_TIMEOUT
+        # AuthorizedHttp exposes these of the wrapped transport
+        self.connections = {}
+        self.redirect_codes = httplib2.REDIRECT_CODES
+
+    def request(self, uri, method="GET", body=None, headers=None, redirections=httplib2.DEFAULT_MAX_REDIRECTS,
+                connection_type=None, **kwargs):
+        response = self.session.request(method, uri, data=body, headers=headers, allow_redirects=redirections > 0)
+        info = {key.lower(): value for key, value in response.headers.items()}
+        # requests has already decoded the body, so its encoding and length no longer apply
+        info.pop("content-encoding", None)
+        info.pop("content-length", None)
+        info["status"] = str(response.status_code)
+        result = httplib2.Response(info)
+        result.reason = response.reason
+        return result, response.content
+
+    def close(self):
+        # Connections belong to the shared pools and stay open for other clients
+        pass
+
+def stats():
+    """Per host: connections opened and requests sent through the shared pools."""
+    pools = get_adapter().poolmanager.pools
+    hosts = {}
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        entry = hosts.setdefault(pool.host, {"connections": 0, "requests": 0})
+        entry["connections"] += pool.num_connections
+        entry["requests"] += pool.num_requests
+    return hosts
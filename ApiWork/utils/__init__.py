@@ -1,6 +1,317 @@
+import logging
+import os
+import json
+import sqlite3
+import asyncio
+import datetime
+import functools
+import threading
+import contextlib
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from ApiWork.transport import SessionHttp, get_session
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
 SCOPES = [
     "https://www.googleapis.com/auth/calendar",
     "https://www.googleapis.com/auth/gmail.modify",
     "https://www.googleapis.com/auth/contacts.readonly",
     "https://www.googleapis.com/auth/contacts.other.readonly"
-]
\ No newline at end of file
+]
+
+TOKEN_PATH = "token.json"
+CLIENT_SECRETS_PATH = "ApiWork/credentials.json"
+# Refresh the access token this long before it actually expires
+TOKEN_REFRESH_MARGIN = datetime.timedelta(seconds=300)
+# Google API clients per service per worker
+SERVICE_POOL_SIZE = int(os.getenv("SERVICE_POOL_SIZE", "8"))
+# Seconds a thread waits for a free client before giving up
+SERVICE_POOL_TIMEOUT = float(os.getenv("SERVICE_POOL_TIMEOUT", "60"))
+
+def make_async(func):
+    """
+    Wraps a blocking function so it can be awaited; the call runs on the
+    default executor instead of blocking the event loop.
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+    return wrapper
+
+# --- Shared Google credentials ---
+
+class SharedCredentials(Credentials):
+    """
+    OAuth credentials shared by every Google service in the process.
+
+    Refreshes happen TOKEN_REFRESH_MARGIN before expiry and are serialized by a
+    thread lock plus a file lock on token.json, so concurrent threads and
+    gunicorn workers refresh once and pick up each other's new token.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def expired(self):
+        if not self.expiry:
+            return False
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return now >= self.expiry - TOKEN_REFRESH_MARGIN
+
+    @property
+    def valid(self):
+        return self.token is not None and not self.expired
+
+    def refresh(self, request):
+        with self._refresh_lock:
+            # Another thread refreshed while we were waiting
+            if self.valid:
+                return
+            with _token_file_lock():
+                # Another worker may have refreshed and saved a newer token
+                saved = _read_token_file()
+                if saved is not None and saved.valid and saved.refresh_token == self.refresh_token:
+                    self.token = saved.token
+                    self.expiry = saved.expiry
+                    return
+                logger.info("Refreshing Google access token")
+                super().refresh(request)
+                _write_token_file(self)
+
+_credentials = None
+_credentials_lock = threading.Lock()
+
+def get_credentials():
+    """
+    Returns the process-wide credentials, loading token.json (or running the
+    OAuth flow) on first use.
+    """
+    global _credentials
+    with _credentials_lock:
+        if _credentials is None:
+            _credentials = _load_credentials()
+        return _credentials
+
+def _load_credentials():
+    creds = _read_token_file()
+    if creds is not None and not set(SCOPES).issubset(set(creds.scopes or [])):
+        logger.warning("Existing token lacks required scopes, re-running OAuth flow...")
+        creds = None
+    if creds and creds.valid:
+        return creds
+    if creds and creds.refresh_token:
+        creds.refresh(Request(get_session()))
+        return creds
+
+    flow = InstalledAppFlow.from_client_secrets_file(CLIENT_SECRETS_PATH, SCOPES)
+    flow_creds = flow.run_local_server(port=0)
+    with _token_file_lock():
+        with open(TOKEN_PATH, "w") as token:
+            token.write(flow_creds.to_json())
+    return _read_token_file()
+
+def _read_token_file():
+    if not os.path.exists(TOKEN_PATH):
+        return None
+    with open(TOKEN_PATH) as token:
+        return SharedCredentials.from_authorized_user_info(json.load(token), SCOPES)
+
+def _write_token_file(creds):
+    # Write-then-rename so other workers never read a half-written token
+    tmp_path = f"{TOKEN_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as token:
+        token.write(creds.to_json())
+    os.replace(tmp_path, TOKEN_PATH)
+
+class _token_file_lock:
+    """Cross-process exclusive lock next to token.json."""
+
+    def __enter__(self):
+        self._file = open(f"{TOKEN_PATH}.lock", "a")
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+# --- Service construction ---
+
+_discovery_docs = {}
+
+def build_service(name, version):
+    """
+    Builds a Google API client on the shared credentials from the discovery
+    document bundled with google-api-python-client, so no network call is made.
+    Requests go through the shared transport (ApiWork.transport).
+    """
+    doc = _discovery_docs.get((name, version))
+    if doc is None:
+        doc = get_static_doc(name, version)
+        if doc is None:
+            raise ValueError(f"No bundled discovery document for {name} {version}")
+        _discovery_docs[(name, version)] = doc
+    # build_from_document mutates the parsed document, so parse a fresh copy
+    return build_from_document(doc, http=AuthorizedHttp(get_credentials(), http=SessionHttp()))
+
+# --- Lazy service handles ---
+
+class LazyService:
+    """
+    Stand-in for an API client that is only constructed on first use.
+
+    Attribute access is forwarded to the real client, so a LazyService can be
+    passed anywhere the client is expected. Construction happens once under a
+    lock; if it fails, the error is kept for status reporting and the next use
+    tries again.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._instance = None
+        self.error = None
+
+    def get(self):
+        instance = self._instance
+        if instance is not None:
+            return instance
+        with self._lock:
+            if self._instance is None:
+                try:
+                    self._instance = self._factory()
+                    self.error = None
+                except Exception as error:
+                    self.error = str(error)
+                    raise
+            return self._instance
+
+    @property
+    def ready(self):
+        return self._instance is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.get(), attr)
+
+# --- Pooled service handles ---
+
+class ServicePool:
+    """
+    Pool of API clients for threads that call the same service concurrently.
+
+    googleapiclient clients are not meant to be shared between threads, so
+    each thread checks out a client for the duration of its calls and returns
+    it afterwards. Clients share the process-wide credentials and the shared
+    transport's connections, and are built on demand, at most size of them;
+    when all are in use, checkout waits for one to be returned. ready and
+    error report the first build the way LazyService does.
+    """
+
+    def __init__(self, name, factory, size=SERVICE_POOL_SIZE, timeout=SERVICE_POOL_TIMEOUT):
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self._factory = factory
+        self._idle = []
+        self._created = 0
+        self._available = threading.Condition()
+        self._built = False
+        self.error = None
+
+    @contextlib.contextmanager
+    def checkout(self):
+        """Lends a client to the calling thread: `with pool.checkout() as service:`."""
+        service = self._acquire()
+        try:
+            yield service
+        finally:
+            with self._available:
+                self._idle.append(service)
+                self._available.notify()
+
+    def _acquire(self):
+        with self._available:
+            while not self._idle:
+                if self._created < self.size:
+                    # Reserve the slot, build outside the lock
+                    self._created += 1
+                    break
+                if not self._available.wait(self.timeout):
+                    raise TimeoutError(f"No {self.name} client free after {self.timeout} seconds")
+            else:
+                return self._idle.pop()
+        try:
+            service = self._factory()
+            self._built = True
+            self.error = None
+            return service
+        except Exception as error:
+            self.error = str(error)
+            with self._available:
+                self._created -= 1
+                self._available.notify()
+            raise
+
+    def get(self):
+        """Builds the first client if needed (used by warm_up)."""
+        with self.checkout() as service:
+            return service
+
+    @property
+    def ready(self):
+        return self._built
+
+    def stats(self):
+        with self._available:
+            return {"size": self.size, "created": self._created, "idle": len(self._idle)}
+
+class SQLiteConnections:
+    """
+    One sqlite3 connection per thread to the database at path, since
+    connections must not be shared between threads. Each is opened in WAL
+    mode with synchronous=NORMAL, so readers don't block the single writer.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def get(self):
+        """The calling thread's connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+def warm_up(services):
+    """Builds every lazy service on a background thread; failures are only recorded."""
+    def run():
+        for service in services:
+            try:
+                service.get()
+            except Exception as error:
+                logger.warning("Warm-up of %s failed: %s", service.name, error)
+
+    thread = threading.Thread(target=run, name="service-warmup", daemon=True)
+    thread.start()
+    return thread
@@ -8,33 +8,123 @@ parse post request, which is structured like so:
 "messages": array of {"content": string, "speaker": int}
 """
 
-from flask import Flask, jsonify, request, render_template
-from google import genai
-from google.genai import types
+from flask import Flask, Response, jsonify, request, render_template
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Optional
 import os
+import json
+import importlib
 import uuid
+import asyncio
+import time
 import datetime
+import queue
+import logging
+import threading
+import contextvars
+from types import SimpleNamespace
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from asgiref.wsgi import WsgiToAsgi
 from dotenv import load_dotenv
 from ApiWork import gcal, gmail, gpeople, jira_slack
+from ApiWork.utils import LazyService, ServicePool, make_async, warm_up
+from ApiWork.store import get_action_store
+from ApiWork import dedup, memo, metrics, transport
+from ApiWork.sessions import OffsetMismatch, get_session_store
+from ApiWork.jobs import get_job_store
+from ApiWork.idempotency import IDEMPOTENCY_POLL_INTERVAL, IDEMPOTENCY_STALE_AFTER, get_request_store, request_key
+from ApiWork.context import build_context, encode_tool_result, estimate_tokens, format_turn
 
 load_dotenv(override=True)
 API_KEY = os.getenv("API_KEY")
 
+# DEBUG also logs transcripts, tool arguments and full Gemini responses
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s")
+logger = logging.getLogger("todos")
+
 # create a Flask server
 app = Flask(__name__)
 
-# In-memory store for proposed actions
-# Structure: { uuid: { uuid: str, data: dict, status: 'pending' } }
-PROPOSED_ACTIONS: Dict[str, Any] = {}
+# Store for proposed actions, shared by all workers (see ApiWork.store)
+# Structure: { uuid: str, data: dict, status: 'pending' | 'executing', created_at: str }
+PROPOSED_ACTIONS = get_action_store()
+# Transcripts of clients that send only new messages (session_id + offset)
+SESSIONS = get_session_store()
+# Background /GetTodos runs (?async=1), polled with GET /jobs/<id>
+JOBS = get_job_store()
+# Responses of finished /GetTodos runs, so a retried request is answered without running again
+TODOS_RESULTS = get_request_store()
+# Seconds between sweeps for actions left "executing" by a killed worker
+STALE_ACTION_SWEEP_INTERVAL = 60
+_last_stale_sweep = 0.0
+
+# /actions/stream: changes made by other workers are picked up every SSE_POLL_INTERVAL seconds
+SSE_POLL_INTERVAL = 1.0
+SSE_KEEPALIVE = 15
+SSE_MAX_SECONDS = 300
+SSE_RETRY_MS = 2000
+
+# Attention items are processed concurrently, bounded by this many threads per request
+MAX_ATTENTION_WORKERS = int(os.getenv("MAX_ATTENTION_WORKERS", "4"))
+# Seconds an attention item may take, counted from when the request submits it
+# (time spent queued for a worker included), before it is reported as failed
+ATTENTION_ITEM_TIMEOUT = float(os.getenv("ATTENTION_ITEM_TIMEOUT", "90"))
+
+GEMINI_MODEL = "gemini-2.5-flash"
+# Upper bound on function-calling round trips per attention item
+MAX_AGENT_TURNS = 10
+
+# Cache the shared transcript context when a request has several attention items
+CONTEXT_CACHE = os.getenv("CONTEXT_CACHE", "1") == "1"
+# Gemini rejects cached contents below this size (gemini-2.5-flash)
+CONTEXT_CACHE_MIN_TOKENS = 1024
+CONTEXT_CACHE_TTL = 600
+# Transcripts above this many tokens are not sent whole; each attention item
+# gets a window around its message (see ApiWork.context.build_context)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+
+# Shared pool for function calls that Gemini requests in the same turn
+MAX_TOOL_WORKERS = int(os.getenv("MAX_TOOL_WORKERS", "8"))
+TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix="tool")
+
+# Background jobs: at most MAX_JOB_WORKERS run at once per worker and
+# MAX_QUEUED_JOBS may be waiting or running before new ones are refused
+MAX_JOB_WORKERS = int(os.getenv("MAX_JOB_WORKERS", "4"))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", "32"))
+JOB_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_JOB_WORKERS, thread_name_prefix="job")
+JOB_SLOTS = threading.BoundedSemaphore(MAX_QUEUED_JOBS)
+# Seconds a client should wait between GET /jobs/<id> polls
+JOB_POLL_INTERVAL = 2
+
+# Called with every action proposed in the current context (e.g. by a background job)
+ACTION_LISTENER = contextvars.ContextVar("action_listener", default=None)
+# Called with (index, error) whenever an attention item finishes; error is None on success
+ITEM_LISTENER = contextvars.ContextVar("item_listener", default=None)
+# The attention index whose chat is running in the current context
+ATTENTION_INDEX = contextvars.ContextVar("attention_index", default=None)
+
+# Services are built on first use, so importing the app never touches the network.
+# With WARMUP_SERVICES=1 (default) each worker builds them on a background thread
+# at boot; /ready reports the progress.
+# Google clients are not meant to be shared between threads, so every thread checks
+# one out of a pool: `with calendar_pool.checkout() as calendar_service:`.
+# All of them, Jira and Slack share the keep-alive connections of ApiWork.transport.
+calendar_pool = ServicePool("calendar", gcal.get_calendar_service)
+gmail_pool = ServicePool("gmail", gmail.get_services)
+people_pool = ServicePool("people", gpeople.get_services)
+jira_client = LazyService("jira", jira_slack.get_jira_client)
+slack_client = LazyService("slack", jira_slack.get_slack_client)
+# google.genai alone is most of the import time, so it is loaded the same way
+genai = LazyService("genai", lambda: importlib.import_module("google.genai"))
+types = LazyService("genai.types", lambda: importlib.import_module("google.genai.types"))
+SERVICES = [genai, types, calendar_pool, gmail_pool, people_pool, jira_client, slack_client]
+
+WARMUP_SERVICES = os.getenv("WARMUP_SERVICES", "1") == "1"
+if WARMUP_SERVICES:
+    warm_up(SERVICES)
 
-# Initialize Services
-calendar_service = gcal.get_calendar_service()
-gmail_service = gmail.get_services()
-people_service = gpeople.get_services()
-jira_client = jira_slack.get_jira_client()
-slack_client = jira_slack.get_slack_client()
 # --- Structured Inputs (Pydantic Models) ---
 
 class CreateCalendarEventInput(BaseModel):
@@ -71,25 +161,48 @@ class UpdateJiraIssueInput(BaseModel):
     summary: Optional[str] = Field(default=None, description="The new summary of the issue")
     description: Optional[str] = Field(default=None, description="The new description of the issue")
 
+class SendSlackMessageInput(BaseModel):
+    message: str = Field(description="Text of the message to post")
+
+class StructuredAction(BaseModel):
+    attention_index: int = Field(description="Index of the attention message this action belongs to")
+    needs_lookup: bool = Field(default=False, description="True if the action needs calendar, email or contact lookups that the transcript cannot answer")
+    create_calendar_event: Optional[CreateCalendarEventInput] = None
+    update_calendar_event: Optional[UpdateCalendarEventInput] = None
+    delete_calendar_event: Optional[DeleteCalendarEventInput] = None
+    send_email: Optional[SendEmailInput] = None
+    create_jira_issue: Optional[CreateJiraIssueInput] = None
+    send_slack_message: Optional[SendSlackMessageInput] = None
+
+class StructuredTodos(BaseModel):
+    actions: List[StructuredAction]
+
 # --- Tool Wrappers ---
 
+@memo.memoized("calendar")
 def list_calendar_events_tool(time_min: str = None, time_max: str = None, max_results: int = 10, query: str = None):
     """
     List calendar events to check availability or existing events.
     """
-    return gcal.list_events(calendar_service, time_min, time_max, max_results, query)
+    with calendar_pool.checkout() as calendar_service:
+        return gcal.list_events(calendar_service, time_min, time_max, max_results, query)
 
+@memo.memoized("gmail")
 def read_emails_tool(query: str = None, max_results: int = 10):
     """
     Read emails to find relevant information.
     """
-    return gmail.read_emails(gmail_service, query, max_results)
+    with gmail_pool.checkout() as gmail_service:
+        return gmail.read_emails(gmail_service, query, max_results)
 
-def get_contacts_tool(query: str = None):
+@memo.memoized("people")
+def get_contacts_tool(query: str = None, max_results: int = 10):
     """
     Get contacts to find email addresses.
     """
-    return gpeople.get_contacts(people_service, query)
+    max_results = min(int(max_results), gpeople.CONTACTS_MAX_RESULTS)
+    with people_pool.checkout() as people_service:
+        return gpeople.get_contacts(people_service, query, max_results)
 
 def create_calendar_event_tool(summary: str, start_time: str, end_time: str, location: str = None, description: str = None, attendees: list[str] = None):
     """
@@ -118,13 +231,15 @@ def update_calendar_event_tool(event_id: str, summary: str = None, start_time: s
     if description: body["description"] = description
     if attendees: body["attendees"] = [{"email": email} for email in attendees]
     
-    return gcal.propose_update_event(calendar_service, event_id, body)
+    with calendar_pool.checkout() as calendar_service:
+        return gcal.propose_update_event(calendar_service, event_id, body)
 
 def delete_calendar_event_tool(event_id: str):
     """
     Propose deleting a calendar event.
     """
-    return gcal.propose_delete_event(calendar_service, event_id)
+    with calendar_pool.checkout() as calendar_service:
+        return gcal.propose_delete_event(calendar_service, event_id)
 
 def send_email_tool(recipient: str, subject: str, body: str):
     """
@@ -144,15 +259,132 @@ def send_slack_message_tool(message: str):
     """
     return jira_slack.propose_send_slack_message(message)
 
+TOOLS = [
+    list_calendar_events_tool,
+    read_emails_tool,
+    get_contacts_tool,
+    create_calendar_event_tool,
+    update_calendar_event_tool,
+    delete_calendar_event_tool,
+    send_email_tool,
+    create_jira_issue_tool,
+    send_slack_message_tool
+]
+
+TOOL_MAP = {tool.__name__: tool for tool in TOOLS}
+
+# Tools whose result is a proposed action rather than information for the model
+PROPOSAL_TOOLS = {
+    "create_calendar_event_tool",
+    "update_calendar_event_tool",
+    "delete_calendar_event_tool",
+    "send_email_tool",
+    "create_jira_issue_tool",
+    "send_slack_message_tool"
+}
+
+# Service each tool talks to, for per-service latency metrics
+TOOL_SERVICES = {
+    "list_calendar_events_tool": "calendar",
+    "create_calendar_event_tool": "calendar",
+    "update_calendar_event_tool": "calendar",
+    "delete_calendar_event_tool": "calendar",
+    "read_emails_tool": "gmail",
+    "send_email_tool": "gmail",
+    "get_contacts_tool": "people",
+    "create_jira_issue_tool": "jira",
+    "send_slack_message_tool": "slack",
+}
+
+# --- Metrics (GET /metrics) ---
+
+GEMINI_TURN_SECONDS = metrics.Histogram(
+    "gemini_turn_seconds", "Latency of one Gemini call", ["kind"]
+)
+AGENT_TURNS = metrics.Histogram(
+    "agent_turns_per_item", "Gemini calls made for one attention item",
+    buckets=range(1, MAX_AGENT_TURNS + 2)
+)
+TOOL_SECONDS = metrics.Histogram(
+    "tool_call_seconds", "Latency of tool calls requested by Gemini", ["tool", "service"]
+)
+ACTION_EXECUTION_SECONDS = metrics.Histogram(
+    "action_execution_seconds", "Latency of executing approved actions", ["service"]
+)
+GET_TODOS_SECONDS = metrics.Histogram(
+    "get_todos_seconds", "Time to run the agent for a /GetTodos request", ["mode"]
+)
+metrics.Callback(
+    "action_store_actions", "Proposed actions in the store by status",
+    lambda: {(status,): PROPOSED_ACTIONS.count(status) for status in ("pending", "executing")},
+    ["status"]
+)
+metrics.Callback(
+    "tool_cache_hits_total", "Read tool calls answered from the request memo cache",
+    lambda: {(tool,): counts["hits"] for tool, counts in memo.stats().items()},
+    ["tool"], kind="counter"
+)
+metrics.Callback(
+    "tool_cache_misses_total", "Read tool calls that went to the service",
+    lambda: {(tool,): counts["misses"] for tool, counts in memo.stats().items()},
+    ["tool"], kind="counter"
+)
+metrics.Callback(
+    "service_pool_clients", "Google API clients built per service, and how many are idle",
+    lambda: {
+        (pool.name, state): pool.stats()[state]
+        for pool in (calendar_pool, gmail_pool, people_pool) for state in ("created", "idle")
+    },
+    ["service", "state"]
+)
+metrics.Callback(
+    "http_connections_opened_total", "Connections opened per host by the shared transport",
+    lambda: {(host,): counts["connections"] for host, counts in transport.stats().items()},
+    ["host"], kind="counter"
+)
+metrics.Callback(
+    "http_requests_total", "Requests sent per host through the shared transport",
+    lambda: {(host,): counts["requests"] for host, counts in transport.stats().items()},
+    ["host"], kind="counter"
+)
+
+def get_genai_client():
+    """Gemini client for a /GetTodos request."""
+    return genai.Client(api_key=API_KEY)
+
 def set_error(context, error_message):
     context["Status"] = 400
     context["Error"] = error_message
-    print(f"Error occurred, error message is: {error_message}")
+    logger.warning("Error occurred, error message is: %s", error_message)
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/ready', methods=['GET'])
+def ready():
+    """
+    Readiness probe: 200 once every service client is built, 503 while warm-up
+    is still running or a client failed to build. Without warm-up, services are
+    built lazily and the app always reports ready.
+    """
+    services = {
+        service.name: "ready" if service.ready else (f"error: {service.error}" if service.error else "pending")
+        for service in SERVICES
+    }
+    is_ready = not WARMUP_SERVICES or all(service.ready for service in SERVICES)
+    return jsonify({"ready": is_ready, "services": services}), 200 if is_ready else 503
+
+@app.route('/tools/cache', methods=['GET'])
+def tool_cache_stats():
+    """Hit/miss counts of the memoized read tools in this worker."""
+    return jsonify({"scope": memo.MEMO_SCOPE, "tools": memo.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Metrics of this worker in the Prometheus text format."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
 # --- Action Management Endpoints ---
 
 def add_proposed_action(data):
@@ -167,14 +399,109 @@ def add_proposed_action(data):
     if data and 'original' in data:
         action_obj['existing_data'] = data['original']
 
-    PROPOSED_ACTIONS[action_id] = action_obj
-    print(f"Action proposed: {action_id}")
-    return action_obj
+    # Several attention items often ask for the same thing; fold repeats of a
+    # pending action into it instead of proposing another copy
+    action_obj['dedup_key'] = dedup.fingerprint(data)
+
+    def merge_duplicate(candidate):
+        if not dedup.is_duplicate(candidate.get('data'), data):
+            return None
+        return dedup.merge(candidate, action_obj)
+
+    stored = PROPOSED_ACTIONS.add_unique(action_obj, merge_duplicate)
+    if stored['uuid'] != action_id:
+        logger.info("Action merged into duplicate: %s", stored['uuid'])
+    else:
+        logger.info("Action proposed: %s", action_id)
+
+    listener = ACTION_LISTENER.get()
+    if listener is not None:
+        listener(stored)
+    return stored
+
+def release_stale_actions():
+    """
+    Puts actions stuck in "executing" (their worker died mid-call) back to
+    pending, at most once every STALE_ACTION_SWEEP_INTERVAL seconds per worker.
+    """
+    global _last_stale_sweep
+    now = time.monotonic()
+    if _last_stale_sweep and now - _last_stale_sweep < STALE_ACTION_SWEEP_INTERVAL:
+        return
+    _last_stale_sweep = now
+    for action_id in PROPOSED_ACTIONS.release_stale():
+        logger.warning("Action %s was left executing; returned it to pending", action_id)
+
+def notify_item(index, error=None):
+    listener = ITEM_LISTENER.get()
+    if listener is not None:
+        listener(index, error)
 
 @app.route('/actions', methods=['GET'])
 def get_actions():
-    """Get all pending actions."""
-    return jsonify(list(PROPOSED_ACTIONS.values()))
+    """
+    Get all pending actions. The store version is sent as the ETag, so a client
+    polling with If-None-Match gets an empty 304 until something changes.
+    """
+    release_stale_actions()
+    version = str(PROPOSED_ACTIONS.version())
+    if request.if_none_match.contains(version):
+        response = Response(status=304)
+    else:
+        response = jsonify(PROPOSED_ACTIONS.list(status="pending"))
+    response.set_etag(version)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def format_sse(event, data, event_id=None):
+    message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message
+
+@app.route('/actions/stream', methods=['GET'])
+def stream_actions():
+    """
+    Server-Sent Events stream of action changes. The first event is a snapshot
+    of the pending actions; after that only deltas (created, updated, deleted,
+    executed) are pushed. Event ids are store versions, so a reconnecting
+    EventSource resumes from Last-Event-ID without reloading everything.
+    """
+    last_event_id = request.headers.get("Last-Event-ID", "")
+
+    def generate():
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        if last_event_id.isdigit():
+            version = int(last_event_id)
+        else:
+            version = PROPOSED_ACTIONS.version()
+            yield format_sse("snapshot", PROPOSED_ACTIONS.list(status="pending"), version)
+
+        # Streams end after SSE_MAX_SECONDS; the browser reconnects and resumes
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            changes = PROPOSED_ACTIONS.changes_since(version)
+            if changes is None:
+                # Fell too far behind the change log, or resumed from an id this store
+                # never reached; start over from a snapshot
+                version = PROPOSED_ACTIONS.version()
+                yield format_sse("snapshot", PROPOSED_ACTIONS.list(status="pending"), version)
+                last_sent = time.monotonic()
+            elif changes:
+                for change in changes:
+                    version = change["version"]
+                    yield format_sse(change["kind"], {"uuid": change["uuid"], "action": change["action"]}, version)
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= SSE_KEEPALIVE:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+            PROPOSED_ACTIONS.wait_for_change(version, SSE_POLL_INTERVAL)
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
 
 @app.route('/actions', methods=['POST'])
 def create_action():
@@ -191,92 +518,281 @@ def create_action():
 
 @app.route('/actions/<action_id>', methods=['PUT'])
 def update_action(action_id):
-    """Update an action's data."""
-    if action_id not in PROPOSED_ACTIONS:
+    """Update a pending action's data; 409 once it is being executed."""
+    data = request.get_json(silent=True)
+    if PROPOSED_ACTIONS.get(action_id) is None:
         return jsonify({"error": "Action not found"}), 404
-    
-    data = request.get_json()
-    if 'data' in data:
-        PROPOSED_ACTIONS[action_id]['data'] = data['data']
+    if not isinstance(data, dict) or not isinstance(data.get('data'), dict):
+        return jsonify({"error": "Invalid update data"}), 400
+    if PROPOSED_ACTIONS.update(action_id, data['data']):
         return jsonify({"status": "updated"})
-    return jsonify({"error": "Invalid update data"}), 400
+    if PROPOSED_ACTIONS.get(action_id) is None:
+        return jsonify({"error": "Action not found"}), 404
+    return jsonify({"error": "Action is no longer pending"}), 409
 
 @app.route('/actions/<action_id>', methods=['DELETE'])
 def delete_action(action_id):
     """Delete/Dismiss an action."""
-    if action_id in PROPOSED_ACTIONS:
-        del PROPOSED_ACTIONS[action_id]
+    if PROPOSED_ACTIONS.delete(action_id):
         return jsonify({"status": "deleted"})
     return jsonify({"error": "Action not found"}), 404
 
 @app.route('/actions/<action_id>/execute', methods=['POST'])
 def execute_action(action_id):
     """Execute the action."""
-    if action_id not in PROPOSED_ACTIONS:
-        return jsonify({"error": "Action not found"}), 404
-    
-    action = PROPOSED_ACTIONS[action_id]
+    release_stale_actions()
     # Allow client to send updated data in the execute request
-    req_data = request.get_json()
-    if req_data and 'data' in req_data:
-        action['data'] = req_data['data']
+    req_data = request.get_json(silent=True)
+    if isinstance(req_data, dict) and 'data' in req_data and not isinstance(req_data['data'], dict):
+        return jsonify({"error": "Invalid action data"}), 400
 
-    action_data = action['data']
-    action_type = action_data.get('action')
+    # Claim the action so a second click (or another worker) cannot run it twice
+    if not PROPOSED_ACTIONS.set_status(action_id, "executing", expected="pending"):
+        if PROPOSED_ACTIONS.get(action_id) is None:
+            return jsonify({"error": "Action not found"}), 404
+        return jsonify({"error": "Action is already being executed"}), 409
 
+    # Everything after the claim runs under the try, so no error can leave the action "executing"
     try:
+        action = PROPOSED_ACTIONS.get(action_id)
+        if action is None:
+            return jsonify({"error": "Action not found"}), 404
+        if isinstance(req_data, dict) and 'data' in req_data:
+            action['data'] = req_data['data']
+            PROPOSED_ACTIONS.update(action_id, action['data'], expected="executing")
+
+        action_data = action.get('data') or {}
+        action_type = action_data.get('action')
+
         result = None
         if action_type in ['create', 'update', 'delete']:
-            print(f"Executing Calendar action {action_id}: {action_data}")
-            result = gcal.execute_action(calendar_service, action_data)
+            logger.info("Executing Calendar action %s", action_id)
+            logger.debug("Action data: %s", action_data)
+            with calendar_pool.checkout() as calendar_service, ACTION_EXECUTION_SECONDS.time(service="calendar"):
+                result = gcal.execute_action(calendar_service, action_data)
+            memo.invalidate("calendar")
         
         elif action_type == 'send_email':
-            print(f"Executing Email action {action_id}: {action_data}")
+            logger.info("Executing Email action %s", action_id)
+            logger.debug("Action data: %s", action_data)
             # The body of the action contains the draft structure
             email_body = action_data.get('body')
-            result = gmail.execute_send_email(gmail_service, email_body)
+            with gmail_pool.checkout() as gmail_service, ACTION_EXECUTION_SECONDS.time(service="gmail"):
+                result = gmail.execute_send_email(gmail_service, email_body)
+            memo.invalidate("gmail")
         
         elif action_type == 'create_jira_issue':
-            print(f"Executing Jira action {action_id}: {action_data}")
-            result = jira_slack.execute_create_jira_issue(jira_client, action_data)
+            logger.info("Executing Jira action %s", action_id)
+            logger.debug("Action data: %s", action_data)
+            with ACTION_EXECUTION_SECONDS.time(service="jira"):
+                result = jira_slack.execute_create_jira_issue(jira_client, action_data)
 
         elif action_type == 'send_slack_message':
-            print(f"Executing Slack action {action_id}: {action_data}")
-            result = jira_slack.execute_send_slack_message(slack_client, action_data)
+            logger.info("Executing Slack action %s", action_id)
+            logger.debug("Action data: %s", action_data)
+            with ACTION_EXECUTION_SECONDS.time(service="slack"):
+                result = jira_slack.execute_send_slack_message(slack_client, action_data)
 
         else:
+            PROPOSED_ACTIONS.set_status(action_id, "pending")
             return jsonify({"error": f"Unknown action type: {action_type}"}), 400
 
         # Remove from pending list after successful execution
-        del PROPOSED_ACTIONS[action_id]
+        PROPOSED_ACTIONS.delete(action_id, kind="executed")
         
         return jsonify({"status": "success", "result": result})
     except Exception as e:
-        print(f"Execution failed: {e}")
+        logger.exception("Execution of action %s failed", action_id)
+        # Put it back so the user can retry
+        PROPOSED_ACTIONS.set_status(action_id, "pending")
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+# --- Batch Action Endpoints ---
+
+BATCH_OPERATIONS = ("dismiss", "update", "execute")
+
+# Action type -> service group executed together in /actions/batch
+ACTION_SERVICES = {
+    "create": "calendar",
+    "update": "calendar",
+    "delete": "calendar",
+    "send_email": "gmail",
+    "create_jira_issue": "jira",
+    "send_slack_message": "slack",
+}
+
+def execute_action_group(service, actions):
+    """
+    Executes claimed actions of one service: {uuid: action data} ->
+    {uuid: (result, error)}. Calendar and Gmail actions go out as Google batch
+    HTTP requests; Jira and Slack have no batch API and run one by one.
+    """
+    if service == "calendar":
+        with calendar_pool.checkout() as calendar_service:
+            outcomes = gcal.execute_actions(calendar_service, actions)
+        memo.invalidate("calendar")
+        return outcomes
+    if service == "gmail":
+        with gmail_pool.checkout() as gmail_service:
+            outcomes = gmail.execute_send_emails(gmail_service, {
+                action_id: data.get('body') for action_id, data in actions.items()
+            })
+        memo.invalidate("gmail")
+        return outcomes
+
+    outcomes = {}
+    for action_id, data in actions.items():
+        # One failure must not lose the outcomes of the actions already sent
+        try:
+            if service == "jira":
+                result = jira_slack.execute_create_jira_issue(jira_client, data)
+            else:
+                result = jira_slack.execute_send_slack_message(slack_client, data)
+        except Exception as error:
+            outcomes[action_id] = (None, error)
+            continue
+        if result.get("status") == "error":
+            outcomes[action_id] = (None, RuntimeError(result.get("message")))
+        else:
+            outcomes[action_id] = (result, None)
+    return outcomes
+
+def execute_actions_batch(items):
+    """
+    Claims and executes the execute operations of a batch, every service group
+    concurrently. items must have distinct uuids. Returns {uuid: result entry}.
+    """
+    release_stale_actions()
+    results = {}
+    groups = {}
+    for item in items:
+        action_id = item["uuid"]
+        if 'data' in item and not isinstance(item['data'], dict):
+            results[action_id] = {"status": "error", "error": "Invalid action data"}
+            continue
+        if not PROPOSED_ACTIONS.set_status(action_id, "executing", expected="pending"):
+            found = PROPOSED_ACTIONS.get(action_id) is not None
+            results[action_id] = {"status": "error", "error": "Action is already being executed" if found else "Action not found"}
+            continue
+        try:
+            action = PROPOSED_ACTIONS.get(action_id)
+            if action is None:
+                results[action_id] = {"status": "error", "error": "Action not found"}
+                continue
+            if 'data' in item:
+                action['data'] = item['data']
+                PROPOSED_ACTIONS.update(action_id, action['data'], expected="executing")
+            data = action.get('data') or {}
+            service = ACTION_SERVICES.get(data.get('action'))
+        except Exception as error:
+            logger.exception("Could not prepare action %s for execution", action_id)
+            PROPOSED_ACTIONS.set_status(action_id, "pending")
+            results[action_id] = {"status": "error", "error": str(error)}
+            continue
+        if service is None:
+            PROPOSED_ACTIONS.set_status(action_id, "pending")
+            results[action_id] = {"status": "error", "error": f"Unknown action type: {data.get('action')}"}
+            continue
+        groups.setdefault(service, {})[action_id] = data
+
+    def timed_group(service, actions):
+        with ACTION_EXECUTION_SECONDS.time(service=service):
+            return execute_action_group(service, actions)
+
+    futures = {
+        service: TOOL_EXECUTOR.submit(timed_group, service, actions)
+        for service, actions in groups.items()
+    }
+    executed = []
+    for service, future in futures.items():
+        try:
+            outcomes = future.result()
+        except Exception as error:
+            logger.exception("Batch execution of %s actions failed", service)
+            outcomes = {action_id: (None, error) for action_id in groups[service]}
+        for action_id in groups[service]:
+            result, error = outcomes.get(action_id, (None, RuntimeError("No response for action")))
+            if error is None:
+                executed.append(action_id)
+                results[action_id] = {"status": "success", "result": result}
+            else:
+                # Put it back so the user can retry
+                PROPOSED_ACTIONS.set_status(action_id, "pending")
+                results[action_id] = {"status": "error", "error": str(error)}
+
+    PROPOSED_ACTIONS.delete_many(executed, kind="executed")
+    return results
+
+@app.route('/actions/batch', methods=['POST'])
+def batch_actions():
+    """
+    Apply several operations in one request.
+    Expected JSON body: {"operations": [{"op": "dismiss" | "update" | "execute", "uuid": ..., "data": ...}]}
+    data is required for update and optional for execute. Dismissals and updates
+    are applied first, then all executions together; an action can be executed
+    only once per batch. Returns one result per operation, in request order.
+    """
+    body = request.get_json(silent=True) or {}
+    operations = body.get('operations')
+    if not isinstance(operations, list):
+        return jsonify({"error": "operations must be a list"}), 400
+
+    results = [None] * len(operations)
+    dismiss = {}
+    executes = []
+    executing = set()
+    for position, operation in enumerate(operations):
+        op = operation.get('op') if isinstance(operation, dict) else None
+        action_id = operation.get('uuid') if op else None
+        if op not in BATCH_OPERATIONS or not action_id:
+            results[position] = {"op": op, "uuid": action_id, "status": "error", "error": "Invalid operation"}
+        elif op == "execute" and action_id in executing:
+            # A second execute would overwrite the first one's result entry and run the action twice
+            results[position] = {"op": op, "uuid": action_id, "status": "error", "error": "Duplicate execute in batch"}
+        elif op == "dismiss":
+            dismiss[position] = action_id
+        elif op == "update":
+            if not isinstance(operation.get('data'), dict):
+                results[position] = {"op": op, "uuid": action_id, "status": "error", "error": "Invalid update data"}
+            elif PROPOSED_ACTIONS.update(action_id, operation['data']):
+                results[position] = {"op": op, "uuid": action_id, "status": "updated"}
+            else:
+                error = "Action not found" if PROPOSED_ACTIONS.get(action_id) is None else "Action is no longer pending"
+                results[position] = {"op": op, "uuid": action_id, "status": "error", "error": error}
+        else:
+            executing.add(action_id)
+            executes.append((position, operation))
+
+    deleted = set(PROPOSED_ACTIONS.delete_many(list(dismiss.values())))
+    for position, action_id in dismiss.items():
+        if action_id in deleted:
+            results[position] = {"op": "dismiss", "uuid": action_id, "status": "deleted"}
+        else:
+            results[position] = {"op": "dismiss", "uuid": action_id, "status": "error", "error": "Action not found"}
+
+    executed = execute_actions_batch([operation for _, operation in executes])
+    for position, operation in executes:
+        results[position] = {"op": "execute", "uuid": operation['uuid'], **executed[operation['uuid']]}
+
+    return jsonify({"results": results})
+
 # --- Existing Endpoints ---
 
-def process_attention_item(client, tools, transcript_text, index, target_message):
+def build_instructions():
     """
-    Process a single attention item with its own chat session.
+    Instructions shared by every attention item of a request.
     """
-    target_content = target_message.get('content', '')
     today_date = datetime.datetime.now().strftime("%Y-%m-%d")
-    
-    prompt = f'''
+
+    return f'''
     You are a helpful assistant that can manage calendar events and emails.
     
-    Here is the full conversation transcript:
-    {transcript_text}
-    
-    Focus specifically on the message at index {index}: "Speaker {target_message.get('speaker', 'Unknown')}: {target_content}".
-    This message (and its surrounding context) indicates that an action needs to be taken (e.g. creating a calendar event, sending an email).
+    You will be given a conversation transcript and asked to focus on one message in it that
+    indicates that an action needs to be taken (e.g. creating a calendar event, sending an email).
     
     Be aware of the times that users give for action items. They may be relative to today's date, {today_date}.
     
-    First, analyze the context around this message to understand the specific user need.
     If you need more information (e.g. checking calendar availability, finding an email address, or looking up an email), use the following tools:
     - list_calendar_events_tool
     - read_emails_tool
@@ -296,155 +812,1089 @@ def process_attention_item(client, tools, transcript_text, index, target_message
     If you still cannot find it after searching, use a placeholder like 'INSERT_EMAIL_HERE' or 'TBD' and PROPOSE THE ACTION ANYWAY.
     DO NOT stop to ask the user for information.
     '''
+
+def build_focus_prompt(index, target_message):
+    """
+    The part of the prompt that is specific to one attention item.
+    """
+    target_content = target_message.get('content', '')
+
+    return f'''
+    Focus specifically on the message at index {index}: "Speaker {target_message.get('speaker', 'Unknown')}: {target_content}".
+    This message (and its surrounding context) indicates that an action needs to be taken (e.g. creating a calendar event, sending an email).
     
-    # Create a chat session
-    chat = client.chats.create(
-        model="gemini-2.5-flash",
-        config=types.GenerateContentConfig(
-            tools=tools,
-            tool_config=types.ToolConfig(
-                function_calling_config=types.FunctionCallingConfig(
-                    mode="AUTO"
-                )
-            ),
+    First, analyze the context around this message to understand the specific user need, then propose the action(s).
+    '''
+
+def build_attention_prompt(transcript_text, index, target_message):
+    """
+    Build the initial prompt for a single attention item when no context cache is used.
+    """
+    return build_instructions() + f'''
+    Here is the full conversation transcript:
+    {transcript_text}
+    ''' + build_focus_prompt(index, target_message)
+
+def build_tool_config():
+    return types.ToolConfig(
+        function_calling_config=types.FunctionCallingConfig(
+            mode="AUTO"
+        )
+    )
+
+def build_chat_config(tools, cached_content=None):
+    """
+    Chat config shared by the sync and async agent loops: tools are offered to the
+    model but every function call is executed by our own loop. With cached_content,
+    tools and instructions already live in the cache and must not be repeated.
+    """
+    if cached_content:
+        return types.GenerateContentConfig(
+            cached_content=cached_content,
             automatic_function_calling=types.AutomaticFunctionCallingConfig(
                 disable=True
             )
         )
+    return types.GenerateContentConfig(
+        tools=tools,
+        tool_config=build_tool_config(),
+        automatic_function_calling=types.AutomaticFunctionCallingConfig(
+            disable=True
+        )
+    )
+
+# --- Transcript context caching ---
+# Every attention item of a request shares the same instructions, tools and transcript.
+# When that prefix is large enough, it is uploaded once as Gemini cached content and
+# each item's chat only sends its focus prompt.
+
+def build_cache_config(tools, transcript_text):
+    return types.CreateCachedContentConfig(
+        display_name="transcript",
+        system_instruction=build_instructions(),
+        contents=[types.Content(role="user", parts=[types.Part(text=f"Here is the full conversation transcript:\n{transcript_text}")])],
+        # Caches take tool declarations, not Python callables
+        tools=[types.Tool(function_declarations=[
+            types.FunctionDeclaration.from_callable_with_api_option(callable=tool) for tool in tools
+        ])],
+        tool_config=build_tool_config(),
+        ttl=f"{CONTEXT_CACHE_TTL}s",
+    )
+
+def should_cache_transcript(transcript_text, item_count):
+    # A cache only pays off when it is read more than once, and Gemini rejects small ones
+    return (
+        CONTEXT_CACHE
+        and item_count > 1
+        and estimate_tokens(build_instructions() + transcript_text) >= CONTEXT_CACHE_MIN_TOKENS
+        and not exceeds_context_budget(transcript_text)
+    )
+
+def exceeds_context_budget(transcript_text):
+    return estimate_tokens(transcript_text) > CONTEXT_TOKEN_BUDGET
+
+def transcript_for_item(messages, index, transcript_text, lines=None):
+    """
+    The transcript an attention item's prompt includes: the whole transcript if it
+    fits CONTEXT_TOKEN_BUDGET, otherwise a window built around the item's message.
+    lines are the request's rendered turns, so the window does not format them again.
+    """
+    if not exceeds_context_budget(transcript_text):
+        return transcript_text
+    return build_context(messages, index, CONTEXT_TOKEN_BUDGET, lines)
+
+def create_transcript_cache(client, tools, transcript_text, item_count):
+    """
+    Returns the name of a cached content holding the shared context, or None
+    when the transcript should be sent inline instead.
+    """
+    if not should_cache_transcript(transcript_text, item_count):
+        return None
+    try:
+        cache = client.caches.create(model=GEMINI_MODEL, config=build_cache_config(tools, transcript_text))
+        logger.info("Created transcript cache %s", cache.name)
+        return cache.name
+    except Exception as cache_error:
+        logger.warning("Could not cache transcript, sending it inline: %s", cache_error)
+        return None
+
+def delete_transcript_cache(client, cache_name):
+    if not cache_name:
+        return
+    try:
+        client.caches.delete(name=cache_name)
+    except Exception as cache_error:
+        # The TTL removes it eventually
+        logger.warning("Could not delete transcript cache %s: %s", cache_name, cache_error)
+
+def call_tool(call):
+    """
+    Run the tool behind one function call. Returns (result, error).
+    """
+    func = TOOL_MAP[call.name]
+    logger.debug("Executing tool: %s with args: %s", call.name, call.args)
+    try:
+        with TOOL_SECONDS.time(tool=call.name, service=TOOL_SERVICES.get(call.name, "")):
+            return func(**(call.args or {})), None
+    except Exception as tool_error:
+        logger.warning("Error executing tool %s: %s", call.name, tool_error)
+        return None, tool_error
+
+class ItemCancelled(Exception):
+    """Raised inside an attention item the request has stopped waiting for."""
+
+def check_cancelled(cancelled):
+    if cancelled is not None and cancelled.is_set():
+        raise ItemCancelled("Attention item cancelled")
+
+def build_function_responses(calls, outcomes, proposed_actions, cancelled=None):
+    """
+    Turn tool outcomes into response Parts in the original call order.
+    Proposals are registered here, one after another, so the order of
+    proposed actions does not depend on which tool finished first. Nothing
+    is registered once the cancelled event is set.
+    """
+    function_responses = []
+    for call, (result, error) in zip(calls, outcomes):
+        if error is not None:
+            function_responses.append(types.Part(
+                function_response=types.FunctionResponse(
+                    name=call.name,
+                    response={"error": str(error)}
+                )
+            ))
+            continue
+
+        # If it's a proposal tool, register the action
+        if call.name in PROPOSAL_TOOLS:
+            check_cancelled(cancelled)
+            action_obj = add_proposed_action(result)
+            proposed_actions.append(action_obj)
+
+        # The model gets a compact, size-capped copy; the proposal keeps the full result
+        function_responses.append(types.Part(
+            function_response=types.FunctionResponse(
+                name=call.name,
+                response=encode_tool_result(result)
+            )
+        ))
+    return function_responses
+
+def run_tool_calls(calls, proposed_actions, cancelled=None):
+    """
+    Execute all function calls of one model turn. Several calls (e.g. contacts,
+    calendar and email lookups) run concurrently on TOOL_EXECUTOR.
+    """
+    calls = [call for call in calls if call.name in TOOL_MAP]
+    if len(calls) > 1:
+        # Each call runs in a copy of this context so it sees the request's memo cache
+        contexts = [contextvars.copy_context() for _ in calls]
+        outcomes = list(TOOL_EXECUTOR.map(lambda context, call: context.run(call_tool, call), contexts, calls))
+    else:
+        outcomes = [call_tool(call) for call in calls]
+    return build_function_responses(calls, outcomes, proposed_actions, cancelled)
+
+def process_attention_item(client, tools, transcript_text, index, target_message, cache_name=None, cancelled=None):
+    """
+    Process a single attention item with its own chat session. Stops with
+    ItemCancelled between model turns once the cancelled event is set.
+    """
+    if cache_name:
+        prompt = build_focus_prompt(index, target_message)
+    else:
+        prompt = build_attention_prompt(transcript_text, index, target_message)
+    
+    # Create a chat session
+    chat = client.chats.create(
+        model=GEMINI_MODEL,
+        config=build_chat_config(tools, cache_name)
     )
 
     # Send initial message
-    response = chat.send_message(prompt)
+    with GEMINI_TURN_SECONDS.time(kind="chat"):
+        response = chat.send_message(prompt)
+    turns = 1
 
     proposed_actions = []
     
     # Manual loop for function calling
-    max_turns = 10
-    for _ in range(max_turns):
+    for _ in range(MAX_AGENT_TURNS):
         if not response.function_calls:
             break
+        check_cancelled(cancelled)
             
-        print(f"Gemini requested function calls for index {index}: {response.function_calls}")
+        logger.debug("Gemini requested function calls for index %s: %s", index, response.function_calls)
         
-        function_responses = []
-        for call in response.function_calls:
-            tool_map = {
-                "list_calendar_events_tool": list_calendar_events_tool,
-                "read_emails_tool": read_emails_tool,
-                "get_contacts_tool": get_contacts_tool,
-                "create_calendar_event_tool": create_calendar_event_tool,
-                "update_calendar_event_tool": update_calendar_event_tool,
-                "delete_calendar_event_tool": delete_calendar_event_tool,
-                "send_email_tool": send_email_tool,
-                "create_jira_issue_tool": create_jira_issue_tool,
-                "send_slack_message_tool": send_slack_message_tool
-            }
-            
-            func = tool_map.get(call.name)
-            if func:
-                print(f"Executing tool: {call.name} with args: {call.args}")
-                try:
-                    # Execute the tool
-                    result = func(**call.args)
-                    
-                    # If it's a proposal tool, register the action
-                    if call.name in ["create_calendar_event_tool", "update_calendar_event_tool", "delete_calendar_event_tool", "send_email_tool", "create_jira_issue_tool", "send_slack_message_tool"]:
-                        action_obj = add_proposed_action(result)
-                        proposed_actions.append(action_obj)
-                        # Return the action object (or just the result) to the model
-                        function_responses.append(types.Part(
-                            function_response=types.FunctionResponse(
-                                name=call.name,
-                                response={"result": result}
-                            )
-                        ))
-                    else:
-                        # Read tool, just return result
-                        function_responses.append(types.Part(
-                            function_response=types.FunctionResponse(
-                                name=call.name,
-                                response={"result": result}
-                            )
-                        ))
-                except Exception as tool_error:
-                    print(f"Error executing tool {call.name}: {tool_error}")
-                    function_responses.append(types.Part(
-                        function_response=types.FunctionResponse(
-                            name=call.name,
-                            response={"error": str(tool_error)}
-                        )
-                    ))
+        function_responses = run_tool_calls(response.function_calls, proposed_actions, cancelled)
         
         # Send function responses back to the model
         if function_responses:
-            print(f"Sending function responses back to Gemini for index {index}")
-            response = chat.send_message(function_responses)
-            print(f"Gemini response after function execution for index {index}: {response}")
+            logger.debug("Sending function responses back to Gemini for index %s", index)
+            with GEMINI_TURN_SECONDS.time(kind="chat"):
+                response = chat.send_message(function_responses)
+            turns += 1
+            logger.debug("Gemini response after function execution for index %s: %s", index, response)
         else:
             break
             
+    AGENT_TURNS.observe(turns)
     return proposed_actions
 
-@app.route('/GetTodos', methods=["POST"])
-def get_todos():
-    print("Received request")
-    data = request.get_json(force=False, silent=False)
-    context = {
-        "Status": 200,
-        "Error": "",
+def process_attention_items(client, tools, transcript_text, messages, indices, cache_name=None, lines=None):
+    """
+    Process every attention index concurrently on a bounded thread pool.
+    Returns (actions, failures): actions keep the order of the indices regardless of
+    which item finishes first, and items that raise or are unfinished ATTENTION_ITEM_TIMEOUT
+    seconds after they were submitted are reported in failures instead of failing the request.
+    """
+    targets = [index for index in indices if index < len(messages)]
+    if not targets:
+        return [], []
+
+    results = {}
+    failures = {}
+    # Set for items the request gave up on, so they stop before proposing anything
+    cancelled = [threading.Event() for _ in targets]
+
+    def run(position, index):
+        check_cancelled(cancelled[position])
+        ATTENTION_INDEX.set(index)
+        logger.debug("Processing attention index %s", index)
+        item_transcript = transcript_for_item(messages, index, transcript_text, lines)
+        return process_attention_item(
+            client, tools, item_transcript, index, messages[index], cache_name, cancelled[position]
+        )
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(MAX_ATTENTION_WORKERS, len(targets))))
+    futures = {
+        pool.submit(contextvars.copy_context().run, run, position, index): position
+        for position, index in enumerate(targets)
     }
+    # Every item is submitted now, so they share one deadline and it bounds the request
+    deadline = time.monotonic() + ATTENTION_ITEM_TIMEOUT
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                position = futures[future]
+                try:
+                    results[position] = future.result()
+                    notify_item(targets[position])
+                except Exception as item_error:
+                    logger.warning("Attention index %s failed: %s", targets[position], item_error)
+                    failures[position] = str(item_error)
+                    notify_item(targets[position], failures[position])
+
+            if pending and time.monotonic() >= deadline:
+                for future in pending:
+                    position = futures[future]
+                    # A running thread cannot be interrupted; it stops at its next check
+                    cancelled[position].set()
+                    future.cancel()
+                    logger.warning("Attention index %s timed out after %ss", targets[position], ATTENTION_ITEM_TIMEOUT)
+                    failures[position] = f"Timed out after {ATTENTION_ITEM_TIMEOUT} seconds"
+                    notify_item(targets[position], failures[position])
+                pending = set()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    actions = []
+    for position in range(len(targets)):
+        actions.extend(results.get(position, []))
+    failed = [{"index": targets[position], "error": failures[position]} for position in sorted(failures)]
+    return unique_actions(actions), failed
+
+def unique_actions(actions):
+    """
+    Drops repeats of actions that were merged as duplicates, keeping the first
+    position and the latest copy of each.
+    """
+    latest = {action['uuid']: action for action in actions}
+    seen = set()
+    unique = []
+    for action in actions:
+        if action['uuid'] not in seen:
+            seen.add(action['uuid'])
+            unique.append(latest[action['uuid']])
+    return unique
+
+# --- Structured-output mode ---
+# One Gemini call returns typed actions for every attention index at once
+# (response_schema built from the input models). Only items the model marks as
+# needing lookups, or whose actions cannot be proposed, go through the tool loop.
+
+TODOS_MODES = ("agent", "structured")
+
+# StructuredAction field -> proposal tool taking the same arguments
+STRUCTURED_TOOLS = {
+    "create_calendar_event": "create_calendar_event_tool",
+    "update_calendar_event": "update_calendar_event_tool",
+    "delete_calendar_event": "delete_calendar_event_tool",
+    "send_email": "send_email_tool",
+    "create_jira_issue": "create_jira_issue_tool",
+    "send_slack_message": "send_slack_message_tool",
+}
+
+def build_structured_prompt(transcript_text, messages, indices):
+    today_date = datetime.datetime.now().strftime("%Y-%m-%d")
+    focus = "\n".join(f'    - {format_turn(index, messages[index])}' for index in indices)
+
+    return f'''
+    You are a helpful assistant that can manage calendar events, emails, Jira issues and Slack messages.
+
+    Be aware of the times that users give for action items. They may be relative to today's date, {today_date}.
 
+    Here is the full conversation transcript:
+    {transcript_text}
+
+    Each of the following messages (and its surrounding context) indicates that an action needs to be taken:
+{focus}
+
+    Return the actions for all of them. Each entry has the attention_index it belongs to and exactly one action field filled in.
+    CRITICAL: You MUST propose at least one action for every attention index.
+
+    If an action needs information the transcript does not contain (an email address that is never mentioned,
+    the ID of an existing calendar event to update or delete, or calendar availability), return an entry for
+    that attention index with needs_lookup set to true and no action fields instead.
+    '''
+
+def build_structured_config():
+    return types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_schema=StructuredTodos
+    )
+
+def parse_structured_response(response):
+    """The model's StructuredTodos; an unusable answer counts as no actions."""
+    parsed = getattr(response, "parsed", None)
+    if isinstance(parsed, StructuredTodos):
+        return parsed
+    try:
+        return StructuredTodos.model_validate_json(response.text or "")
+    except ValueError as error:
+        logger.warning("Could not parse structured response: %s", error)
+        return StructuredTodos(actions=[])
+
+def plan_structured_calls(todos, targets):
+    """
+    Turn the model's actions into proposal tool calls per attention index.
+    Returns (calls by index, indices that need the tool loop).
+    """
+    calls = {index: [] for index in targets}
+    needs_lookup = set()
+    for entry in todos.actions:
+        if entry.attention_index not in calls:
+            continue
+        if entry.needs_lookup:
+            needs_lookup.add(entry.attention_index)
+            continue
+        for field, tool_name in STRUCTURED_TOOLS.items():
+            value = getattr(entry, field)
+            if value is not None:
+                calls[entry.attention_index].append(
+                    SimpleNamespace(name=tool_name, args=value.model_dump(exclude_none=True))
+                )
+
+    fallback = [index for index in targets if index in needs_lookup or not calls[index]]
+    return {index: calls[index] for index in targets if index not in fallback}, fallback
+
+def register_structured_outcomes(calls, outcomes):
+    """Proposed actions for one attention item, or None if any of its calls failed."""
+    if any(error is not None for _, error in outcomes):
+        return None
+    return [add_proposed_action(result) for result, _ in outcomes]
+
+def process_structured(client, tools, transcript_text, messages, indices, lines=None):
+    """
+    Structured-output counterpart of process_attention_items with the same
+    return value. Actions of items that fell back to the tool loop follow the
+    ones proposed directly. Transcripts over CONTEXT_TOKEN_BUDGET go to the
+    tool loop, which windows the transcript per item.
+    """
+    targets = [index for index in indices if index < len(messages)]
+    if not targets:
+        return [], []
+
+    if exceeds_context_budget(transcript_text):
+        logger.info("Transcript exceeds the context budget, running structured request in the tool loop")
+        return process_attention_items(client, tools, transcript_text, messages, targets, lines=lines)
+
+    with GEMINI_TURN_SECONDS.time(kind="structured"):
+        response = client.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=build_structured_prompt(transcript_text, messages, targets),
+            config=build_structured_config()
+        )
+    calls_by_index, fallback = plan_structured_calls(parse_structured_response(response), targets)
+
+    actions = []
+    for index, calls in calls_by_index.items():
+        ATTENTION_INDEX.set(index)
+        proposed = register_structured_outcomes(calls, [call_tool(call) for call in calls])
+        if proposed is None:
+            fallback.append(index)
+        else:
+            actions.extend(proposed)
+            notify_item(index)
+    ATTENTION_INDEX.set(None)
+
+    if not fallback:
+        return unique_actions(actions), []
+
+    fallback.sort()
+    logger.info("Structured mode falling back to the tool loop for indices %s", fallback)
+    cache_name = create_transcript_cache(client, tools, transcript_text, len(fallback))
+    try:
+        fallback_actions, failed = process_attention_items(
+            client, tools, transcript_text, messages, fallback, cache_name, lines
+        )
+    finally:
+        delete_transcript_cache(client, cache_name)
+    return unique_actions(actions + fallback_actions), failed
+
+def validate_todos_request(data, context):
+    """
+    Check a /GetTodos payload and resolve its transcript. Returns
+    (indices, messages, transcript_text, lines), or None after setting the
+    error on context. lines are the rendered transcript turns.
+
+    A payload with session_id and offset is a delta: messages holds only the
+    messages from offset on, and attention_indices are absolute positions in
+    the session. Without an offset, messages is the full conversation.
+    """
     # process the POST request data
-    if 'attention_indices' not in data or 'messages' not in data:
+    if not data or 'attention_indices' not in data or 'messages' not in data:
         set_error(context, "Improperly formatted request, attention_indices or messages is not included in JSON payload")
-        return jsonify(**context)
+        return None
         
     indices = data['attention_indices']
     messages = data['messages']
 
+    if data.get('offset') is not None:
+        session_id = data.get('session_id')
+        offset = data['offset']
+        if not session_id or not isinstance(offset, int) or offset < 0 or not isinstance(messages, list):
+            set_error(context, "Incremental requests need a session_id, a non-negative offset and a messages list")
+            return None
+        try:
+            # A snapshot: appends by concurrent requests do not change this request's transcript
+            session = SESSIONS.append(str(session_id), offset, messages)
+        except OffsetMismatch as error:
+            set_error(context, str(error))
+            context["Status"] = 409
+            context["ExpectedOffset"] = error.expected
+            return None
+        messages, lines, transcript_text = session
+        context["MessageCount"] = len(messages)
+    else:
+        lines = transcript_text = None
+
     if not indices or not messages or indices[-1] >= len(messages):
-        print(indices, messages)
+        logger.debug("Invalid indices %s for %s messages", indices, len(messages))
         set_error(context, "Messages or indices contain invalid content")
-        return jsonify(**context)
-    
+        return None
+
+    if lines is None:
+        lines = [format_turn(i, msg) for i, msg in enumerate(messages)]
+        transcript_text = build_transcript(lines)
+    return indices, messages, transcript_text, lines
+
+def build_transcript(lines):
+    """Full transcript context from the rendered turns, one numbered line per message."""
+    return "Full Conversation Transcript:\n" + '\n'.join(lines)
+
+def run_todos(data, indices, messages, transcript_text, mode, context, lines=None):
+    """Run the agent for a validated /GetTodos request and fill in context."""
     # process messages and output it, for the time being just return the list of messages that are relevant
-    client = genai.Client(api_key=API_KEY)
-
-    tools = [
-        list_calendar_events_tool,
-        read_emails_tool,
-        get_contacts_tool,
-        create_calendar_event_tool,
-        update_calendar_event_tool,
-        delete_calendar_event_tool,
-        send_email_tool,
-        create_jira_issue_tool,
-        send_slack_message_tool
-    ]
-    
-    # Full transcript context
-    transcript_text = "Full Conversation Transcript:\n" + '\n'.join([f"[{i}] Speaker {msg.get('speaker', 'Unknown')}: {msg.get('content', '')}" for i, msg in enumerate(messages)])
-    print(transcript_text)
+    started = time.perf_counter()
+    client = get_genai_client()
+    logger.debug("Transcript:\n%s", transcript_text)
     
+    cache_name = None
     try:
-        all_proposed_actions = []
-        
-        for index in indices:
-            if index >= len(messages): continue
-            
-            target_message = messages[index]
-            print(f"Processing attention index {index}...")
-            
-            actions = process_attention_item(client, tools, transcript_text, index, target_message)
-            all_proposed_actions.extend(actions)
+        # Attention items share calendar, email and contact lookups
+        with memo.scope(data.get('session_id')):
+            if mode == "structured":
+                all_proposed_actions, failed_items = process_structured(
+                    client, TOOLS, transcript_text, messages, indices, lines
+                )
+            else:
+                cache_name = create_transcript_cache(client, TOOLS, transcript_text, len(indices))
+                all_proposed_actions, failed_items = process_attention_items(
+                    client, TOOLS, transcript_text, messages, indices, cache_name, lines
+                )
         
         context["Todos"] = all_proposed_actions
+        if failed_items:
+            context["FailedItems"] = failed_items
 
     except Exception as error:
         set_error(context, f"Error: {error}")
-        return jsonify(**context)
+    finally:
+        delete_transcript_cache(client, cache_name)
+        GET_TODOS_SECONDS.observe(time.perf_counter() - started, mode=mode)
 
+    return context
+
+def todos_request_key(data, indices, messages, mode):
+    """request_key of a validated /GetTodos request; session deltas are keyed by their delta only."""
+    if data.get('offset') is not None:
+        return request_key(data.get('session_id'), data['messages'], indices, mode, message_count=len(messages))
+    return request_key(data.get('session_id'), messages, indices, mode)
+
+def claim_todos_request(key):
+    """
+    TODOS_RESULTS.claim(key), waiting while another caller runs the request.
+    A run unfinished after IDEMPOTENCY_STALE_AFTER seconds counts as abandoned,
+    so a waiter normally takes the key over by then; "running" is returned only
+    if someone else still holds it at that point.
+    """
+    deadline = time.monotonic() + IDEMPOTENCY_STALE_AFTER
+    while True:
+        state, stored = TODOS_RESULTS.claim(key)
+        if state != "running" or time.monotonic() >= deadline:
+            return state, stored
+        TODOS_RESULTS.wait(key, IDEMPOTENCY_POLL_INTERVAL)
+
+def set_busy(context):
+    context["Status"] = 503
+    context["Error"] = "The same request is still running, try again later"
+    logger.warning("Gave up waiting for a running /GetTodos request with the same key")
+
+def run_todos_once(data, indices, messages, transcript_text, mode, context, lines=None):
+    """
+    run_todos at most once per identical request (same session, messages,
+    attention indices and mode). A retry that arrives while the first run is
+    going waits for it; one that arrives later gets the stored response, marked
+    Replayed, instead of a second Gemini conversation and a second set of
+    proposals.
+    """
+    key = todos_request_key(data, indices, messages, mode)
+    state, stored = claim_todos_request(key)
+    if state == "done":
+        logger.info("Replaying stored /GetTodos response for a retried request")
+        return dict(stored, Replayed=True)
+    if state == "running":
+        set_busy(context)
+        return context
+    try:
+        run_todos(data, indices, messages, transcript_text, mode, context, lines)
+    except BaseException:
+        TODOS_RESULTS.complete(key, {"Status": 500})
+        raise
+    TODOS_RESULTS.complete(key, context)
+    return context
+
+def run_todos_job(job_id, data, indices, messages, transcript_text, mode, lines=None):
+    """Background job body: runs the agent and records actions as they are proposed."""
+    try:
+        JOBS.set_status(job_id, "running")
+        ACTION_LISTENER.set(lambda action: JOBS.add_action(job_id, action))
+        context = {
+            "Status": 200,
+            "Error": "",
+        }
+        JOBS.finish(job_id, run_todos(data, indices, messages, transcript_text, mode, context, lines))
+    except Exception as error:
+        logger.exception("Job %s failed", job_id)
+        JOBS.finish(job_id, {"Status": 500, "Error": f"Error: {error}"})
+    finally:
+        JOB_SLOTS.release()
+
+def submit_todos_job(data, indices, messages, transcript_text, mode, lines=None):
+    """Queues a /GetTodos run on JOB_EXECUTOR. Returns the job id, or None when the queue is full."""
+    if not JOB_SLOTS.acquire(blocking=False):
+        return None
+    job_id = str(uuid.uuid4())
+    try:
+        JOBS.create(job_id)
+        # A fresh context per job, so the listener never leaks into the request
+        JOB_EXECUTOR.submit(
+            contextvars.Context().run, run_todos_job, job_id, data, indices, messages, transcript_text, mode, lines
+        )
+    except Exception:
+        JOB_SLOTS.release()
+        raise
+    logger.info("Queued job %s", job_id)
+    return job_id
+
+def is_async_flag(value):
+    return str(value).lower() in ("1", "true", "yes")
+
+def action_record(action):
+    return {"type": "action", "index": ATTENTION_INDEX.get(), "action": action}
+
+def item_record(index, error=None):
+    if error is None:
+        return {"type": "item_done", "index": index}
+    return {"type": "item_error", "index": index, "error": error}
+
+def done_record(context):
+    return {
+        "type": "done",
+        "Status": context.get("Status"),
+        "Error": context.get("Error", ""),
+        "Count": len(context.get("Todos", [])),
+        "FailedItems": context.get("FailedItems", []),
+    }
+
+def stream_todos(data, indices, messages, transcript_text, mode, context, lines=None):
+    """
+    NDJSON records of a streamed /GetTodos run: an "action" record as soon as
+    each action is proposed (a merged duplicate is sent again with the same
+    uuid), "item_done"/"item_error" when an attention item finishes, and a
+    final "done" record. The run happens on its own thread and keeps going if
+    the client disconnects.
+    """
+    records = queue.Queue()
+
+    def worker():
+        ACTION_LISTENER.set(lambda action: records.put(action_record(action)))
+        ITEM_LISTENER.set(lambda index, error: records.put(item_record(index, error)))
+        try:
+            run_todos(data, indices, messages, transcript_text, mode, context, lines)
+        except Exception as error:
+            set_error(context, f"Error: {error}")
+        finally:
+            records.put(done_record(context))
+
+    threading.Thread(target=contextvars.Context().run, args=(worker,), daemon=True).start()
+    while True:
+        record = records.get()
+        yield json.dumps(record) + "\n"
+        if record["type"] == "done":
+            return
+
+def wants_stream(flag, accept):
+    return is_async_flag(flag) or "application/x-ndjson" in (accept or "")
+
+def todos_error_response(context, stream):
+    if stream:
+        return Response(json.dumps(done_record(context)) + "\n", mimetype="application/x-ndjson")
     return jsonify(**context)
 
+@app.route('/GetTodos', methods=["POST"])
+def get_todos():
+    logger.info("Received /GetTodos request")
+    data = request.get_json(force=False, silent=False)
+    context = {
+        "Status": 200,
+        "Error": "",
+    }
+
+    stream = wants_stream(request.args.get('stream'), request.headers.get('Accept'))
+
+    parsed = validate_todos_request(data, context)
+    if parsed is None:
+        return todos_error_response(context, stream)
+    indices, messages, transcript_text, lines = parsed
+
+    mode = request.args.get('mode') or data.get('mode') or "agent"
+    if mode not in TODOS_MODES:
+        set_error(context, f"Unknown mode {mode}, expected one of {', '.join(TODOS_MODES)}")
+        return todos_error_response(context, stream)
+
+    if stream:
+        # Streamed responses keep their HTTP 200; errors are reported in the records
+        return Response(
+            stream_todos(data, indices, messages, transcript_text, mode, context, lines),
+            mimetype="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    if is_async_flag(request.args.get('async')):
+        job_id = submit_todos_job(data, indices, messages, transcript_text, mode, lines)
+        if job_id is None:
+            set_error(context, "Too many queued jobs, try again later")
+            context["Status"] = 503
+            response = jsonify(**context)
+            response.status_code = 503
+            response.headers["Retry-After"] = str(JOB_POLL_INTERVAL * 5)
+            return response
+        context["Status"] = 202
+        context["JobId"] = job_id
+        context["JobUrl"] = f"/jobs/{job_id}"
+        response = jsonify(**context)
+        response.status_code = 202
+        response.headers["Location"] = context["JobUrl"]
+        return response
+
+    response = jsonify(**run_todos_once(data, indices, messages, transcript_text, mode, context, lines))
+    if context["Status"] == 503:
+        response.status_code = 503
+        response.headers["Retry-After"] = str(JOB_POLL_INTERVAL * 5)
+    return response
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Status of a background /GetTodos job: queued, running, done or failed.
+    Todos holds the actions proposed so far, FailedItems and Error are set
+    once the job has finished.
+    """
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    response = jsonify(job)
+    if job["status"] in ("queued", "running"):
+        response.headers["Retry-After"] = str(JOB_POLL_INTERVAL)
+    return response
+
+# --- Async agent loop (ASGI) ---
+# The same agent loop on the async Gemini client. Blocking Google/Jira/Slack calls
+# run on worker threads, so one process can hold many in-flight conversations.
+
+ASYNC_TOOL_MAP = {name: make_async(func) for name, func in TOOL_MAP.items()}
+
+async def create_transcript_cache_async(aio_client, tools, transcript_text, item_count):
+    """Async counterpart of create_transcript_cache."""
+    if not should_cache_transcript(transcript_text, item_count):
+        return None
+    try:
+        cache = await aio_client.caches.create(model=GEMINI_MODEL, config=build_cache_config(tools, transcript_text))
+        logger.info("Created transcript cache %s", cache.name)
+        return cache.name
+    except Exception as cache_error:
+        logger.warning("Could not cache transcript, sending it inline: %s", cache_error)
+        return None
+
+async def delete_transcript_cache_async(aio_client, cache_name):
+    if not cache_name:
+        return
+    try:
+        await aio_client.caches.delete(name=cache_name)
+    except Exception as cache_error:
+        logger.warning("Could not delete transcript cache %s: %s", cache_name, cache_error)
+
+_aio_client = None
+
+def get_aio_client():
+    """Shared async Gemini client, so connections are pooled across requests."""
+    global _aio_client
+    if _aio_client is None:
+        _aio_client = genai.Client(api_key=API_KEY).aio
+    return _aio_client
+
+async def call_tool_async(call):
+    """Async counterpart of call_tool."""
+    func = ASYNC_TOOL_MAP[call.name]
+    logger.debug("Executing tool: %s with args: %s", call.name, call.args)
+    try:
+        with TOOL_SECONDS.time(tool=call.name, service=TOOL_SERVICES.get(call.name, "")):
+            return await func(**(call.args or {})), None
+    except Exception as tool_error:
+        logger.warning("Error executing tool %s: %s", call.name, tool_error)
+        return None, tool_error
+
+async def run_tool_calls_async(calls, proposed_actions, cancelled=None):
+    """Async counterpart of run_tool_calls; all calls of the turn are gathered."""
+    calls = [call for call in calls if call.name in ASYNC_TOOL_MAP]
+    outcomes = await asyncio.gather(*(call_tool_async(call) for call in calls))
+    # Registering proposals writes to the action store (BEGIN IMMEDIATE), which must not block the loop.
+    # The thread outlives a cancelled task, so it checks the cancelled event itself.
+    return await asyncio.to_thread(build_function_responses, calls, outcomes, proposed_actions, cancelled)
+
+async def process_attention_item_async(aio_client, tools, transcript_text, index, target_message, cache_name=None,
+                                       cancelled=None):
+    """
+    Process a single attention item with its own async chat session.
+    """
+    if cache_name:
+        prompt = build_focus_prompt(index, target_message)
+    else:
+        prompt = build_attention_prompt(transcript_text, index, target_message)
+
+    chat = aio_client.chats.create(
+        model=GEMINI_MODEL,
+        config=build_chat_config(tools, cache_name)
+    )
+
+    with GEMINI_TURN_SECONDS.time(kind="chat"):
+        response = await chat.send_message(prompt)
+    turns = 1
+
+    proposed_actions = []
+
+    for _ in range(MAX_AGENT_TURNS):
+        if not response.function_calls:
+            break
+
+        logger.debug("Gemini requested function calls for index %s: %s", index, response.function_calls)
+
+        function_responses = await run_tool_calls_async(response.function_calls, proposed_actions, cancelled)
+
+        if function_responses:
+            logger.debug("Sending function responses back to Gemini for index %s", index)
+            with GEMINI_TURN_SECONDS.time(kind="chat"):
+                response = await chat.send_message(function_responses)
+            turns += 1
+        else:
+            break
+
+    AGENT_TURNS.observe(turns)
+    return proposed_actions
+
+async def process_attention_items_async(aio_client, tools, transcript_text, messages, indices, cache_name=None, lines=None):
+    """
+    Async counterpart of process_attention_items: same ordering, concurrency bound,
+    per-item timeout and partial-failure semantics, but timed out items are cancelled.
+    """
+    targets = [index for index in indices if index < len(messages)]
+    semaphore = asyncio.Semaphore(max(1, MAX_ATTENTION_WORKERS))
+
+    async def run_item(index, cancelled):
+        async with semaphore:
+            logger.debug("Processing attention index %s", index)
+            return await process_attention_item_async(
+                aio_client, tools, transcript_for_item(messages, index, transcript_text, lines),
+                index, messages[index], cache_name, cancelled
+            )
+
+    async def run(index):
+        # gather runs each item as a task with its own copy of the context
+        ATTENTION_INDEX.set(index)
+        # Set when the item is given up on, so a store write still running on a thread proposes nothing
+        cancelled = threading.Event()
+        try:
+            # The timeout covers the wait for the semaphore, as in the threaded version
+            result = await asyncio.wait_for(run_item(index, cancelled), timeout=ATTENTION_ITEM_TIMEOUT)
+        except asyncio.TimeoutError:
+            cancelled.set()
+            notify_item(index, f"Timed out after {ATTENTION_ITEM_TIMEOUT} seconds")
+            raise
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        except Exception as item_error:
+            notify_item(index, str(item_error))
+            raise
+        notify_item(index)
+        return result
+
+    results = await asyncio.gather(*(run(index) for index in targets), return_exceptions=True)
+
+    actions = []
+    failed = []
+    for index, result in zip(targets, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.warning("Attention index %s timed out after %ss", index, ATTENTION_ITEM_TIMEOUT)
+            failed.append({"index": index, "error": f"Timed out after {ATTENTION_ITEM_TIMEOUT} seconds"})
+        elif isinstance(result, BaseException):
+            logger.warning("Attention index %s failed: %s", index, result)
+            failed.append({"index": index, "error": str(result)})
+        else:
+            actions.extend(result)
+    return unique_actions(actions), failed
+
+async def process_structured_async(aio_client, tools, transcript_text, messages, indices, lines=None):
+    """Async counterpart of process_structured."""
+    targets = [index for index in indices if index < len(messages)]
+    if not targets:
+        return [], []
+
+    if exceeds_context_budget(transcript_text):
+        logger.info("Transcript exceeds the context budget, running structured request in the tool loop")
+        return await process_attention_items_async(aio_client, tools, transcript_text, messages, targets, lines=lines)
+
+    with GEMINI_TURN_SECONDS.time(kind="structured"):
+        response = await aio_client.models.generate_content(
+            model=GEMINI_MODEL,
+            contents=build_structured_prompt(transcript_text, messages, targets),
+            config=build_structured_config()
+        )
+    calls_by_index, fallback = plan_structured_calls(parse_structured_response(response), targets)
+
+    actions = []
+    for index, calls in calls_by_index.items():
+        ATTENTION_INDEX.set(index)
+        outcomes = await asyncio.gather(*(call_tool_async(call) for call in calls))
+        proposed = await asyncio.to_thread(register_structured_outcomes, calls, outcomes)
+        if proposed is None:
+            fallback.append(index)
+        else:
+            actions.extend(proposed)
+            notify_item(index)
+    ATTENTION_INDEX.set(None)
+
+    if not fallback:
+        return unique_actions(actions), []
+
+    fallback.sort()
+    logger.info("Structured mode falling back to the tool loop for indices %s", fallback)
+    cache_name = await create_transcript_cache_async(aio_client, tools, transcript_text, len(fallback))
+    try:
+        fallback_actions, failed = await process_attention_items_async(
+            aio_client, tools, transcript_text, messages, fallback, cache_name, lines
+        )
+    finally:
+        await delete_transcript_cache_async(aio_client, cache_name)
+    return unique_actions(actions + fallback_actions), failed
+
+async def get_todos_async(data, mode=None, once=False):
+    """
+    Async /GetTodos handler. Returns the response context dict. With once,
+    retries of the request are answered like run_todos_once.
+    """
+    logger.info("Received /GetTodos request")
+    context = {
+        "Status": 200,
+        "Error": "",
+    }
+
+    # Session deltas touch SQLite, so resolve the transcript off the event loop
+    parsed = await asyncio.to_thread(validate_todos_request, data, context)
+    if parsed is None:
+        return context
+    indices, messages, transcript_text, lines = parsed
+
+    mode = mode or data.get('mode') or "agent"
+    if mode not in TODOS_MODES:
+        set_error(context, f"Unknown mode {mode}, expected one of {', '.join(TODOS_MODES)}")
+        return context
+
+    if not once:
+        return await run_todos_async(data, indices, messages, transcript_text, mode, context, lines)
+
+    key = todos_request_key(data, indices, messages, mode)
+    deadline = time.monotonic() + IDEMPOTENCY_STALE_AFTER
+    while True:
+        state, stored = await asyncio.to_thread(TODOS_RESULTS.claim, key)
+        if state == "claimed":
+            break
+        if state == "done":
+            logger.info("Replaying stored /GetTodos response for a retried request")
+            return dict(stored, Replayed=True)
+        if time.monotonic() >= deadline:
+            set_busy(context)
+            return context
+        await asyncio.to_thread(TODOS_RESULTS.wait, key, IDEMPOTENCY_POLL_INTERVAL)
+    try:
+        await run_todos_async(data, indices, messages, transcript_text, mode, context, lines)
+    except BaseException:
+        await asyncio.to_thread(TODOS_RESULTS.complete, key, {"Status": 500})
+        raise
+    await asyncio.to_thread(TODOS_RESULTS.complete, key, context)
+    return context
+
+async def run_todos_async(data, indices, messages, transcript_text, mode, context, lines=None):
+    """Async counterpart of run_todos."""
+    started = time.perf_counter()
+    aio_client = get_aio_client()
+
+    cache_name = None
+    try:
+        with memo.scope(data.get('session_id')):
+            if mode == "structured":
+                all_proposed_actions, failed_items = await process_structured_async(
+                    aio_client, TOOLS, transcript_text, messages, indices, lines
+                )
+            else:
+                cache_name = await create_transcript_cache_async(aio_client, TOOLS, transcript_text, len(indices))
+                all_proposed_actions, failed_items = await process_attention_items_async(
+                    aio_client, TOOLS, transcript_text, messages, indices, cache_name, lines
+                )
+
+        context["Todos"] = all_proposed_actions
+        if failed_items:
+            context["FailedItems"] = failed_items
+
+    except Exception as error:
+        set_error(context, f"Error: {error}")
+    finally:
+        await delete_transcript_cache_async(aio_client, cache_name)
+        GET_TODOS_SECONDS.observe(time.perf_counter() - started, mode=mode)
+
+    return context
+
+async def stream_todos_async(data, mode, send):
+    """Async counterpart of stream_todos, written straight to the ASGI send channel."""
+    loop = asyncio.get_running_loop()
+    records = asyncio.Queue()
+    # Listeners may fire on tool threads as well as on the event loop
+    put = lambda record: loop.call_soon_threadsafe(records.put_nowait, record)
+    ACTION_LISTENER.set(lambda action: put(action_record(action)))
+    ITEM_LISTENER.set(lambda index, error: put(item_record(index, error)))
+
+    async def run():
+        context = {"Status": 500, "Error": "Error: run aborted"}
+        try:
+            context = await get_todos_async(data, mode)
+        finally:
+            put(done_record(context))
+
+    # The task gets a copy of this context, listeners included
+    task = asyncio.create_task(run())
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/x-ndjson"), (b"cache-control", b"no-cache")],
+    })
+    while True:
+        record = await records.get()
+        await send({"type": "http.response.body", "body": (json.dumps(record) + "\n").encode(), "more_body": True})
+        if record["type"] == "done":
+            break
+    await task
+    await send({"type": "http.response.body", "body": b""})
+
+# Every other route is served by the Flask app on asgiref's thread pool
+_flask_asgi = WsgiToAsgi(app)
+
+async def _read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+async def asgi_app(scope, receive, send):
+    """
+    ASGI entry point: `uvicorn __init__:asgi_app`. POST /GetTodos (plain or
+    streamed) runs on the native async agent loop; everything else, including background jobs
+    (/GetTodos?async=1), is delegated to Flask.
+    """
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] == "http" and scope["path"] == "/GetTodos" and scope["method"] == "POST":
+        query = parse_qs(scope.get("query_string", b"").decode())
+        if is_async_flag((query.get("async") or [None])[0]):
+            # Background jobs are queued by the Flask route and run on JOB_EXECUTOR
+            await _flask_asgi(scope, receive, send)
+            return
+        body = await _read_body(receive)
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            data = None
+        headers = dict(scope.get("headers") or [])
+        if wants_stream((query.get("stream") or [None])[0], headers.get(b"accept", b"").decode()):
+            await stream_todos_async(data, (query.get("mode") or [None])[0], send)
+            return
+        context = await get_todos_async(data, (query.get("mode") or [None])[0], once=True)
+        payload = json.dumps(context).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())]
+        if context["Status"] == 503:
+            headers.append((b"retry-after", str(JOB_POLL_INTERVAL * 5).encode()))
+        await send({
+            "type": "http.response.start",
+            "status": 503 if context["Status"] == 503 else 200,
+            "headers": headers,
+        })
+        await send({"type": "http.response.body", "body": payload})
+        return
+
+    await _flask_asgi(scope, receive, send)
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080, debug=True)
@@ -0,0 +1,205 @@
+"""
+Load test for the agent loop and the /actions endpoints with every external
+client replaced by the in-process fakes in ApiWork.fakes (no network, no
+Google accounts). Each phase sends --requests requests from --concurrency
+threads and reports throughput and p50/p95/p99 latency.
+
+    python bench_agent.py [--requests 200] [--concurrency 8] [--mode agent]
+                          [--model-latency 0.05] [--service-latency 0.02]
+
+Phases:
+    todos      POST /GetTodos with a scripted model (lookups, then proposals)
+    create     POST /actions
+    list       GET /actions
+    execute    POST /actions/<id>/execute
+    batch      POST /actions/batch, --batch-size executes per request
+"""
+import argparse
+import concurrent.futures
+import datetime
+import itertools
+import time
+import uuid
+
+from bench_context_cache import build_payload, load_app
+
+PHASES = ("todos", "create", "list", "execute", "batch")
+
+# Each attention item looks things up, then proposes one action per service
+SCRIPT = [
+    [
+        ("get_contacts_tool", {"query": "Grant"}),
+        ("list_calendar_events_tool", {}),
+        ("read_emails_tool", {"query": "from:grantow@umich.edu", "max_results": 5}),
+    ],
+    [
+        ("create_calendar_event_tool", {
+            "summary": "Meeting with Grant Wang",
+            "start_time": "2030-01-04T10:00:00",
+            "end_time": "2030-01-04T11:00:00",
+            "attendees": ["grantow@umich.edu"],
+        }),
+        ("send_email_tool", {"recipient": "grantow@umich.edu", "subject": "The thing", "body": "Following up on the thing."}),
+    ],
+    [("create_jira_issue_tool", {"summary": "Race condition in the code", "description": "Seen during the meeting."})],
+]
+
+def structured_answer(indices):
+    """What the structured-mode model answers for a payload: one Jira issue per item."""
+    return {"actions": [
+        {"attention_index": index, "create_jira_issue": {"summary": f"Issue {index}", "description": "From the transcript"}}
+        for index in indices
+    ]}
+
+def install_fakes(app_module, model_latency, service_latency, indices):
+    """Points the app's client handles at fresh fakes; returns them by name."""
+    from ApiWork import fakes
+    from ApiWork.utils import ServicePool
+    clients = {
+        "genai": fakes.FakeGenaiClient(SCRIPT, structured_answer(indices), latency=model_latency),
+        "calendar": fakes.FakeCalendarService(latency=service_latency),
+        "gmail": fakes.FakeGmailService(latency=service_latency),
+        "people": fakes.FakePeopleService(latency=service_latency),
+        "jira": fakes.FakeJiraClient(latency=service_latency),
+        "slack": fakes.FakeSlackClient(latency=service_latency),
+    }
+    app_module.get_genai_client = lambda: clients["genai"]
+    app_module._aio_client = clients["genai"].aio
+    # The fakes are thread-safe, so every pooled handle is the same fake
+    app_module.calendar_pool = ServicePool("calendar", lambda: clients["calendar"])
+    app_module.gmail_pool = ServicePool("gmail", lambda: clients["gmail"])
+    app_module.people_pool = ServicePool("people", lambda: clients["people"])
+    app_module.jira_client = clients["jira"]
+    app_module.slack_client = clients["slack"]
+    return clients
+
+def sample_action(n):
+    """A proposal that never deduplicates against the others, cycling through the services."""
+    token = uuid.uuid4().hex
+    kind = n % 4
+    if kind == 0:
+        start = datetime.datetime(2030, 1, 1, 9) + datetime.timedelta(hours=n)
+        return {"action": "create", "body": {
+            "summary": f"Bench event {token}",
+            "start": {"dateTime": start.isoformat(), "timeZone": "America/Detroit"},
+            "end": {"dateTime": (start + datetime.timedelta(minutes=30)).isoformat(), "timeZone": "America/Detroit"},
+        }}
+    if kind == 1:
+        return {"action": "send_email", "body": {
+            "recipient": f"person{n}@example.com", "subject": f"Bench {token}", "body": "Benchmark message",
+        }}
+    if kind == 2:
+        return {"action": "create_jira_issue", "body": {"summary": f"{token} bench issue", "description": "Benchmark"}}
+    return {"action": "send_slack_message", "body": {"message": f"{token} bench message"}}
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of a sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, int(round(fraction * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+def run_phase(send, count, concurrency):
+    """Calls send(n) for n in range(count) from concurrency threads. send returns True on success."""
+    def timed(n):
+        start = time.perf_counter()
+        ok = send(n)
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(count)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(duration for duration, _ in results)
+    return {
+        "requests": count,
+        "errors": sum(1 for _, ok in results if not ok),
+        "throughput": count / elapsed if elapsed else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
+
+def create_actions(client, numbers):
+    uuids = []
+    for n in numbers:
+        response = client.post("/actions", json=sample_action(n))
+        uuids.append(response.json["uuid"])
+    return uuids
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per phase")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mode", choices=("agent", "structured"), default="agent")
+    parser.add_argument("--messages", type=int, default=200, help="transcript length for /GetTodos")
+    parser.add_argument("--attention", type=int, default=3, help="attention items per /GetTodos")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="seconds per Gemini call")
+    parser.add_argument("--service-latency", type=float, default=0.02, help="seconds per API round trip")
+    parser.add_argument("--batch-size", type=int, default=10, help="executes per /actions/batch request")
+    parser.add_argument("--phases", default=",".join(PHASES), help="comma-separated subset of " + ", ".join(PHASES))
+    args = parser.parse_args()
+
+    phases = [phase.strip() for phase in args.phases.split(",") if phase.strip()]
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        parser.error(f"unknown phases: {', '.join(sorted(unknown))}")
+
+    app_module = load_app()
+    payload = dict(build_payload(args.messages, args.attention), mode=args.mode)
+    clients = install_fakes(app_module, args.model_latency, args.service_latency, payload["attention_indices"])
+    client = app_module.app.test_client()
+    counter = itertools.count()
+
+    def todos(n):
+        # Distinct sessions, so every request runs the agent instead of being replayed
+        response = client.post("/GetTodos", json=dict(payload, session_id=f"bench-{uuid.uuid4()}"))
+        return response.status_code == 200 and response.json.get("Status") == 200
+
+    def create(n):
+        return client.post("/actions", json=sample_action(next(counter))).status_code == 201
+
+    def list_actions(n):
+        return client.get("/actions").status_code == 200
+
+    def execute_phase():
+        uuids = create_actions(client, itertools.islice(counter, args.requests))
+        return lambda n: client.post(f"/actions/{uuids[n]}/execute").status_code == 200
+
+    def batch_phase():
+        uuids = create_actions(client, itertools.islice(counter, args.requests * args.batch_size))
+
+        def batch(n):
+            group = uuids[n * args.batch_size:(n + 1) * args.batch_size]
+            operations = [{"op": "execute", "uuid": action_id} for action_id in group]
+            response = client.post("/actions/batch", json={"operations": operations})
+            return response.status_code == 200 and all(result.get("status") == "success" for result in response.json["results"])
+        return batch
+
+    senders = {
+        "todos": lambda: todos,
+        "create": lambda: create,
+        "list": lambda: list_actions,
+        "execute": execute_phase,
+        "batch": batch_phase,
+    }
+
+    # One untimed request so lazy imports and first syncs do not land in the percentiles
+    todos(0)
+
+    print(f"{args.requests} requests per phase, concurrency {args.concurrency}, mode {args.mode}, "
+          f"model latency {args.model_latency * 1000:.0f} ms, service latency {args.service_latency * 1000:.0f} ms")
+    print(f"{'phase':<10}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for phase in phases:
+        stats = run_phase(senders[phase](), args.requests, args.concurrency)
+        print(f"{phase:<10}{stats['requests']:>10}{stats['errors']:>8}{stats['throughput']:>10.1f}"
+              f"{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}{stats['p99'] * 1000:>10.1f}")
+
+    usage = clients["genai"].usage
+    print(f"model requests {usage['requests']}, prompt tokens {usage['prompt_tokens']}")
+    for name in ("calendar", "gmail", "people", "jira", "slack"):
+        calls = clients[name].calls
+        print(f"{name:<10}" + (", ".join(f"{method} {count}" for method, count in sorted(calls.items())) or "-"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Compares billed prompt tokens for /GetTodos when the whole transcript is sent
+inline, when it is shared through context caching, and when each item only gets
+a token-budgeted window, using the offline FakeGenaiClient (no network, no
+Google accounts).
+
+    python bench_context_cache.py [--messages 2000] [--attention 6] [--budget 8000]
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import uuid
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def load_app():
+    os.environ.setdefault("WARMUP_SERVICES", "0")
+    os.environ.setdefault("ACTION_STORE", "memory")
+    os.environ.setdefault("IDEMPOTENCY_STORE", "memory")
+    os.environ.setdefault("SESSION_STORE", "memory")
+    os.environ.setdefault("JOB_STORE", "memory")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, APP_DIR)
+    spec = importlib.util.spec_from_file_location("app", os.path.join(APP_DIR, "__init__.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["app"] = module
+    spec.loader.exec_module(module)
+    return module
+
+def build_payload(message_count, attention_count):
+    lines = [
+        "Make a calendar event for a meeting with Grant Wang on next friday at 10:00 AM",
+        "Yeah I really need that calendar event created.",
+        "Also send an email to Grant right? About the thing",
+        "Create a Jira issue for the race condition we're seeing in the code.",
+    ]
+    messages = [{"speaker": i % 3 + 1, "content": lines[i % len(lines)]} for i in range(message_count)]
+    step = message_count // (attention_count + 1)
+    indices = [step * (n + 1) for n in range(attention_count)]
+    for index in indices:
+        messages[index] = {"speaker": 0, "content": "Attention"}
+    return {"session_id": "bench", "messages": messages, "attention_indices": indices}
+
+def run(app_module, payload, cache, budget=10 ** 9):
+    from ApiWork.fakes import FakeGenaiClient
+    fake = FakeGenaiClient()
+    app_module.CONTEXT_CACHE = cache
+    app_module.CONTEXT_TOKEN_BUDGET = budget
+    app_module.get_genai_client = lambda: fake
+    # A new session per run, so the run is not answered from the idempotency store
+    payload = dict(payload, session_id=f"bench-{uuid.uuid4()}")
+    response = app_module.app.test_client().post("/GetTodos", json=payload)
+    assert response.json["Status"] == 200, response.json
+    return fake.usage
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--attention", type=int, default=6)
+    parser.add_argument("--budget", type=int, default=8000, help="CONTEXT_TOKEN_BUDGET for the windowed run")
+    args = parser.parse_args()
+
+    app_module = load_app()
+    payload = build_payload(args.messages, args.attention)
+    inline = run(app_module, payload, cache=False)
+    cached = run(app_module, payload, cache=True)
+    windowed = run(app_module, payload, cache=True, budget=args.budget)
+
+    print(f"{args.messages} messages, {args.attention} attention items")
+    print(f"{'':<10}{'prompt':>12}{'cached':>12}{'cache write':>14}{'requests':>10}")
+    for label, usage in (("inline", inline), ("cached", cached), ("windowed", windowed)):
+        print(f"{label:<10}{usage['prompt_tokens']:>12}{usage['cached_tokens']:>12}{usage['cache_tokens']:>14}{usage['requests']:>10}")
+    saved = 1 - cached["prompt_tokens"] / inline["prompt_tokens"]
+    print(f"full-rate prompt tokens reduced by {saved:.1%} with caching")
+
+if __name__ == "__main__":
+    main()
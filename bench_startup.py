@@ -0,0 +1,60 @@
+"""
+Measures worker boot cost: time to import the app module and time until the
+first request is answered, each in a fresh interpreter.
+
+    python bench_startup.py [--runs 5] [--warmup]
+
+Service warm-up is disabled by default so the numbers show what a worker pays
+before it can serve; --warmup enables the background warm-up thread.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a child interpreter; prints one JSON line with the timings
+CHILD = r'''
+import importlib.util, json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, APP_DIR)
+spec = importlib.util.spec_from_file_location("app", APP_DIR + "/__init__.py")
+module = importlib.util.module_from_spec(spec)
+sys.modules["app"] = module
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+response = module.app.test_client().get("/ready")
+answered = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "first_request_ms": (answered - imported) * 1000,
+    "total_ms": (answered - start) * 1000,
+    "status": response.status_code,
+}))
+'''
+
+def run_once(warmup):
+    env = dict(os.environ, WARMUP_SERVICES="1" if warmup else "0")
+    output = subprocess.run(
+        [sys.executable, "-c", f"APP_DIR = {APP_DIR!r}\n" + CHILD],
+        cwd=APP_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warmup", action="store_true")
+    args = parser.parse_args()
+
+    results = [run_once(args.warmup) for _ in range(args.runs)]
+    print(f"{args.runs} runs, warm-up {'on' if args.warmup else 'off'}, /ready status {results[-1]['status']}")
+    for key in ("import_ms", "first_request_ms", "total_ms"):
+        values = [r[key] for r in results]
+        print(f"  {key:<17} median {statistics.median(values):8.1f}  min {min(values):8.1f}  max {max(values):8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
 bind = "0.0.0.0:8080"
 workers = 2
-
+# Threaded workers, so open /actions/stream connections don't each pin a whole worker
+worker_class = "gthread"
+threads = 8
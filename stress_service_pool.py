@@ -0,0 +1,283 @@
+"""
+Stress test for the pooled Google API clients: many threads call list_events,
+get_event, read_emails and get_contacts at once against a local stub of the
+Calendar, Gmail and People APIs, and every answer is checked against what
+was asked for. Real googleapiclient clients on the shared transport
+(ApiWork.transport) are used; only the server is fake.
+
+    python stress_service_pool.py [--threads 32] [--calls 2000] [--pool-size 8]
+                                  [--latency 0.005] [--shared] [--httplib2]
+
+--shared gives every thread the same client, without the pool or any lock.
+--httplib2 gives each client its own httplib2.Http instead of the shared
+transport; together with --shared it shows the failures the pool prevents.
+Exits with status 1 if any call failed or returned the wrong data.
+"""
+import argparse
+import concurrent.futures
+import email.parser
+import http.server
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+
+# Every call should reach the stub, not the local mirrors
+os.environ.setdefault("CALENDAR_SYNC_TTL", "0")
+os.environ.setdefault("CONTACTS_TTL", "0")
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, APP_DIR)
+
+import httplib2
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from ApiWork import gcal, gmail, gpeople, transport
+from ApiWork.utils import ServicePool
+
+EVENT_COUNT = 25
+EMAIL_COUNT = 10
+CONTACT_COUNT = 40
+
+def stub_event(event_id):
+    return {
+        "id": event_id,
+        "status": "confirmed",
+        "summary": f"Event {event_id}",
+        "start": {"dateTime": "2030-01-01T10:00:00+00:00"},
+        "end": {"dateTime": "2030-01-01T11:00:00+00:00"},
+    }
+
+def stub_email(message_id):
+    return {
+        "id": message_id,
+        "snippet": f"Snippet {message_id}",
+        "payload": {"headers": [
+            {"name": "Subject", "value": f"Subject {message_id}"},
+            {"name": "From", "value": f"sender-{message_id}@example.com"},
+        ]},
+    }
+
+def stub_person(n):
+    return {
+        "resourceName": f"people/c{n}",
+        "names": [{"displayName": f"Person{n} Example"}],
+        "emailAddresses": [{"value": f"person{n}@example.com"}],
+        "metadata": {},
+    }
+
+def answer(method, path):
+    """The stub's JSON answer to one API call, or None for unknown paths."""
+    path = urllib.parse.urlparse(path).path
+    if path.endswith("/calendars/primary/events"):
+        return {"items": [stub_event(f"event{n}") for n in range(EVENT_COUNT)], "nextSyncToken": "stub"}
+    if "/calendars/primary/events/" in path:
+        return stub_event(path.rsplit("/", 1)[1])
+    if path.endswith("/users/me/messages"):
+        return {"messages": [{"id": f"msg{n}"} for n in range(EMAIL_COUNT)]}
+    if "/users/me/messages/" in path:
+        return stub_email(path.rsplit("/", 1)[1])
+    if path.endswith("/people/me/connections"):
+        return {"connections": [stub_person(n) for n in range(CONTACT_COUNT)], "nextSyncToken": "stub"}
+    if path.endswith("/otherContacts"):
+        return {"otherContacts": [], "nextSyncToken": "stub"}
+    return None
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    # Keep-alive, like the real APIs
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; without this, delayed ACKs add 40 ms
+    disable_nagle_algorithm = True
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        body = answer("GET", self.path)
+        if body is None:
+            self._send(404, "application/json", b'{"error": {"code": 404}}')
+        else:
+            self._send(200, "application/json", json.dumps(body).encode())
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = self.rfile.read(length)
+        time.sleep(self.latency)
+        if "batch" not in self.path:
+            self._send(404, "application/json", b'{"error": {"code": 404}}')
+            return
+        self._send_batch(payload)
+
+    def _send_batch(self, payload):
+        content_type = self.headers["Content-Type"]
+        message = email.parser.BytesParser().parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode() + payload
+        )
+        boundary = "stub_batch_boundary"
+        parts = []
+        for part in message.get_payload():
+            content_id = part["Content-ID"].strip("<>")
+            request_line = part.get_payload().lstrip().split("\n", 1)[0]
+            method, path = request_line.split(" ")[:2]
+            body = answer(method, path)
+            status = "200 OK" if body is not None else "404 Not Found"
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n\r\n{json.dumps(body or {})}\r\n"
+            )
+        data = ("".join(parts) + f"--{boundary}--\r\n").encode()
+        self._send(200, f"multipart/mixed; boundary={boundary}", data)
+
+    def _send(self, status, content_type, data):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def start_stub(latency):
+    StubHandler.latency = latency
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+def stub_factory(name, version, root_url, use_httplib2, timeout):
+    """Builds real clients for name/version that talk to the stub."""
+    credentials = Credentials(token="stub-token")
+
+    def build():
+        doc = json.loads(get_static_doc(name, version))
+        doc["rootUrl"] = root_url
+        if use_httplib2:
+            # A timeout, so a corrupted connection fails instead of hanging
+            http = httplib2.Http(timeout=timeout)
+        else:
+            http = transport.SessionHttp()
+        return build_from_document(json.dumps(doc), http=AuthorizedHttp(credentials, http=http))
+    return build
+
+class SharedClients:
+    """--shared: one client for every thread, checked out without any locking."""
+
+    def __init__(self, factory):
+        self._service = factory()
+        self.name = "shared"
+
+    def checkout(self):
+        service = self._service
+
+        class Lease:
+            def __enter__(self):
+                return service
+
+            def __exit__(self, *exc):
+                return False
+        return Lease()
+
+    def stats(self):
+        return {"created": 1}
+
+def make_workload(pools):
+    """Returns call(n): one checked read against the stub, True if the answer is right."""
+    event_ids = itertools.count()
+
+    def list_events(n):
+        with pools["calendar"].checkout() as service:
+            events = gcal.list_events(service, time_min="2000-01-01T00:00:00Z", max_results=EVENT_COUNT)
+        return len(events) == EVENT_COUNT
+
+    def get_event(n):
+        # A fresh id every time, so the lookup is not answered from the mirror
+        event_id = f"lookup{next(event_ids)}"
+        with pools["calendar"].checkout() as service:
+            event = gcal.get_event(service, event_id)
+        return event is not None and event["id"] == event_id
+
+    def read_emails(n):
+        with pools["gmail"].checkout() as service:
+            emails = gmail.read_emails(service, "is:unread", EMAIL_COUNT)
+        return len(emails) == EMAIL_COUNT and all(e["subject"] == f"Subject {e['id']}" for e in emails)
+
+    def get_contacts(n):
+        person = n % CONTACT_COUNT
+        with pools["people"].checkout() as service:
+            contacts = gpeople.get_contacts(service, f"person{person}@example.com")
+        return any(contact["email"] == f"person{person}@example.com" for contact in contacts)
+
+    calls = [list_events, get_event, read_emails, get_contacts]
+    return lambda n: calls[n % len(calls)](n)
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered), max(1, int(round(fraction * len(ordered) + 0.5)))) - 1]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--pool-size", type=int, default=8, help="clients per service")
+    parser.add_argument("--latency", type=float, default=0.005, help="stub server delay per response, seconds")
+    parser.add_argument("--httplib2", action="store_true", help="one httplib2.Http per client instead of the shared transport")
+    parser.add_argument("--timeout", type=float, default=5, help="httplib2 socket timeout, seconds")
+    parser.add_argument("--shared", action="store_true", help="share one unlocked client per service instead of the pool")
+    args = parser.parse_args()
+
+    server, root_url = start_stub(args.latency)
+    factories = {
+        "calendar": stub_factory("calendar", "v3", root_url, args.httplib2, args.timeout),
+        "gmail": stub_factory("gmail", "v1", root_url, args.httplib2, args.timeout),
+        "people": stub_factory("people", "v1", root_url, args.httplib2, args.timeout),
+    }
+    if args.shared:
+        pools = {name: SharedClients(factory) for name, factory in factories.items()}
+    else:
+        pools = {name: ServicePool(name, factory, size=args.pool_size) for name, factory in factories.items()}
+    call = make_workload(pools)
+
+    failures = []
+
+    def timed(n):
+        start = time.perf_counter()
+        try:
+            ok = call(n)
+            if not ok:
+                failures.append(f"call {n}: wrong answer")
+        except Exception as error:
+            ok = False
+            failures.append(f"call {n}: {type(error).__name__}: {error}")
+        return time.perf_counter() - start, ok
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = list(executor.map(timed, range(args.calls)))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    latencies = sorted(duration for duration, _ in results)
+    print(f"{args.calls} calls from {args.threads} threads, "
+          f"{'one shared client' if args.shared else f'pool size {args.pool_size}'}, "
+          f"{'httplib2' if args.httplib2 else 'shared transport'}, stub latency {args.latency * 1000:.0f} ms")
+    print(f"failed {len(failures)}, {args.calls / elapsed:.0f} calls/s, "
+          f"p50 {percentile(latencies, 0.50) * 1000:.1f} ms, p95 {percentile(latencies, 0.95) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+    print("clients built: " + ", ".join(f"{name} {pool.stats()['created']}" for name, pool in pools.items()))
+    if not args.httplib2:
+        print("connections opened: " + ", ".join(
+            f"{host} {counts['connections']} for {counts['requests']} requests" for host, counts in transport.stats().items()
+        ))
+    for failure in failures[:10]:
+        print("  " + failure)
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Unit tests for ApiWork.dedup. Run from the repository root: python -m pytest tests"""
+from ApiWork import dedup
+
+def jira(summary, description="From the transcript"):
+    return {"action": "create_jira_issue", "body": {"summary": summary, "description": description}}
+
+def slack(message):
+    return {"action": "send_slack_message", "body": {"message": message}}
+
+def email(subject, body="See you there.", recipient="grant@example.com"):
+    return {"action": "send_email", "body": {"recipient": recipient, "subject": subject, "body": body}}
+
+def event(summary, description=None, start="2030-01-04T10:00:00"):
+    body = {
+        "summary": summary,
+        "start": {"dateTime": start, "timeZone": "America/Detroit"},
+        "end": {"dateTime": "2030-01-04T11:00:00", "timeZone": "America/Detroit"},
+    }
+    if description:
+        body["description"] = description
+    return {"action": "create", "body": body}
+
+def same(first, second):
+    return dedup.fingerprint(first) == dedup.fingerprint(second) and dedup.is_duplicate(first, second)
+
+def test_numbered_jira_issues_are_distinct():
+    assert not same(jira("Issue 10"), jira("Issue 20"))
+
+def test_jira_issues_differing_by_one_word_are_distinct():
+    assert not same(jira("Fix login bug on iOS"), jira("Fix login bug on Android"))
+
+def test_quarters_are_distinct():
+    assert not same(jira("Update Q3 report"), jira("Update Q4 report"))
+
+def test_slack_messages_with_different_times_are_distinct():
+    assert not same(slack("Standup moved to 10am"), slack("Standup moved to 11am"))
+
+def test_emails_with_different_bodies_are_distinct():
+    assert not same(email("The thing", body="Can we meet Friday?"), email("The thing", body="Can we meet Monday?"))
+
+def test_jira_issues_with_different_descriptions_are_distinct():
+    assert not same(jira("Race condition", "In the login flow"), jira("Race condition", "In the payment flow"))
+
+def test_repeated_jira_issue_is_a_duplicate():
+    assert same(jira("Race condition in the code"), jira("Race condition in the code!"))
+
+def test_repeated_email_is_a_duplicate():
+    assert same(email("The thing"), email("the thing"))
+
+def test_similar_event_summaries_are_duplicates():
+    assert same(event("Meeting with Grant Wang"), event("Meeting w/ Grant Wang"))
+
+def test_events_with_different_numbers_are_distinct():
+    assert not same(event("Sprint 3 planning"), event("Sprint 4 planning"))
+
+def test_events_at_different_times_are_distinct():
+    assert not same(event("Meeting with Grant"), event("Meeting with Grant", start="2030-01-04T09:00:00"))
+
+def test_events_with_different_descriptions_are_distinct():
+    assert not same(event("Meeting with Grant", "Budget"), event("Meeting with Grant", "Hiring"))
+
+def test_merge_keeps_the_stored_text_and_fills_missing_fields():
+    stored = {"uuid": "a", "data": event("Meeting with Grant Wang")}
+    duplicate = {"uuid": "b", "data": event("Meeting w/ Grant Wang", description="Agenda: the thing")}
+    assert same(stored["data"], duplicate["data"])
+    merged = dedup.merge(stored, duplicate)
+    assert merged["uuid"] == "a"
+    assert merged["duplicates"] == 1
+    assert merged["data"]["body"]["summary"] == "Meeting with Grant Wang"
+    assert merged["data"]["body"]["description"] == "Agenda: the thing"
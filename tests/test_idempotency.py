@@ -0,0 +1,63 @@
+"""Unit tests for ApiWork.idempotency. Run from the repository root: python -m pytest tests"""
+import threading
+
+import pytest
+
+from ApiWork import idempotency
+
+@pytest.fixture(params=["memory", "sqlite"])
+def results(request, tmp_path):
+    if request.param == "memory":
+        return idempotency.MemoryRequestStore()
+    return idempotency.SQLiteRequestStore(str(tmp_path / "idempotency.db"))
+
+def response(**fields):
+    return {"Status": 200, "Error": "", "Todos": [{"uuid": "a"}], **fields}
+
+def test_first_claim_runs_and_retry_waits(results):
+    assert results.claim("k") == ("claimed", None)
+    assert results.claim("k") == ("running", None)
+
+def test_completed_response_is_replayed(results):
+    results.claim("k")
+    results.complete("k", response())
+    assert results.claim("k") == ("done", response())
+
+def test_failed_run_releases_the_key(results):
+    results.claim("k")
+    results.complete("k", {"Status": 500, "Error": "Error: boom"})
+    assert results.claim("k") == ("claimed", None)
+
+def test_run_with_failed_items_is_not_kept(results):
+    results.claim("k")
+    results.complete("k", response(FailedItems=[{"index": 3, "error": "Timed out after 90 seconds"}]))
+    assert results.claim("k") == ("claimed", None)
+
+def test_abandoned_run_is_taken_over(results, monkeypatch):
+    results.claim("k")
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_STALE_AFTER", -1)
+    assert results.claim("k") == ("claimed", None)
+
+def test_wait_returns_when_the_run_finishes(results):
+    results.claim("k")
+    finisher = threading.Timer(0.05, results.complete, ("k", response()))
+    finisher.start()
+    results.wait("k", 0.5)
+    finisher.join()
+    assert results.claim("k")[0] == "done"
+
+def test_oldest_responses_are_evicted(tmp_path):
+    for results in (idempotency.MemoryRequestStore(max_entries=2),
+                    idempotency.SQLiteRequestStore(str(tmp_path / "idempotency.db"), max_entries=2)):
+        for key in ("a", "b", "c"):
+            results.claim(key)
+            results.complete(key, response())
+        assert results.claim("a") == ("claimed", None)
+        assert results.claim("c")[0] == "done"
+
+def test_request_key_covers_session_delta():
+    messages = [{"speaker": 1, "content": "Set up a meeting with Sam"}]
+    key = idempotency.request_key("s", messages, [4], "agent", message_count=5)
+    assert key == idempotency.request_key("s", messages, [4], "agent", message_count=5)
+    assert key != idempotency.request_key("s", messages, [4], "agent", message_count=6)
+    assert key != idempotency.request_key("s", messages, [4], "structured", message_count=5)
@@ -0,0 +1,44 @@
+"""Unit tests for ApiWork.jobs. Run from the repository root: python -m pytest tests"""
+import pytest
+
+from ApiWork import jobs
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return jobs.MemoryJobStore()
+    return jobs.SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+def test_job_moves_from_queued_to_done(store):
+    assert store.create("j")["status"] == "queued"
+    store.set_status("j", "running")
+    assert store.get("j")["status"] == "running"
+    store.finish("j", {"Status": 200, "Error": "", "Todos": [{"uuid": "a"}]})
+    job = store.get("j")
+    assert job["status"] == "done"
+    assert job["Todos"] == [{"uuid": "a"}]
+    assert job["finished_at"] is not None
+
+def test_failed_job_keeps_its_actions(store):
+    store.create("j")
+    store.add_action("j", {"uuid": "a"})
+    store.finish("j", {"Status": 500, "Error": "Error: boom"})
+    job = store.get("j")
+    assert job["status"] == "failed"
+    assert job["Error"] == "Error: boom"
+    assert job["Todos"] == [{"uuid": "a"}]
+
+def test_merged_duplicate_replaces_its_action(store):
+    store.create("j")
+    store.add_action("j", {"uuid": "a", "data": {"summary": "Sync"}})
+    store.add_action("j", {"uuid": "b", "data": {"summary": "Standup"}})
+    store.add_action("j", {"uuid": "a", "data": {"summary": "Sync with Sam"}})
+    assert store.get("j")["Todos"] == [
+        {"uuid": "a", "data": {"summary": "Sync with Sam"}},
+        {"uuid": "b", "data": {"summary": "Standup"}},
+    ]
+
+def test_unknown_job(store):
+    assert store.get("missing") is None
+    store.add_action("missing", {"uuid": "a"})
+    assert store.get("missing") is None
@@ -0,0 +1,68 @@
+"""Unit tests for ApiWork.sessions. Run from the repository root: python -m pytest tests"""
+import pytest
+
+from ApiWork import sessions
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return sessions.MemorySessionStore()
+    return sessions.SQLiteSessionStore(str(tmp_path / "sessions.db"))
+
+def messages(start, stop):
+    return [{"speaker": n % 2, "content": f"message {n}"} for n in range(start, stop)]
+
+def test_append_builds_the_transcript(store):
+    snapshot = store.append("s", 0, messages(0, 3))
+    assert list(snapshot.messages) == messages(0, 3)
+    assert len(snapshot.lines) == 3
+    assert snapshot.text.startswith("Full Conversation Transcript:\n")
+    assert snapshot.text.endswith(snapshot.lines[-1])
+
+def test_delta_continues_at_offset(store):
+    store.append("s", 0, messages(0, 3))
+    assert list(store.append("s", 3, messages(3, 5)).messages) == messages(0, 5)
+
+def test_overlapping_delta_is_not_stored_twice(store):
+    store.append("s", 0, messages(0, 3))
+    assert list(store.append("s", 1, messages(1, 4)).messages) == messages(0, 4)
+
+def test_resent_delta_changes_nothing(store):
+    store.append("s", 0, messages(0, 3))
+    assert list(store.append("s", 0, messages(0, 3)).messages) == messages(0, 3)
+
+def test_gap_raises_offset_mismatch(store):
+    store.append("s", 0, messages(0, 3))
+    with pytest.raises(sessions.OffsetMismatch) as error:
+        store.append("s", 5, messages(5, 6))
+    assert error.value.expected == 3
+    assert len(store.append("s", 3, []).messages) == 3
+
+def test_snapshot_is_unaffected_by_later_appends(store):
+    first = store.append("s", 0, messages(0, 3))
+    store.append("s", 3, messages(3, 5))
+    assert list(first.messages) == messages(0, 3)
+    assert len(first.lines) == 3
+    assert first.lines[-1] == first.text.split("\n")[-1]
+
+def test_sessions_are_separate(store):
+    store.append("s", 0, messages(0, 3))
+    assert len(store.append("t", 0, messages(0, 1)).messages) == 1
+
+def test_sqlite_session_continues_on_another_worker(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first, second = sessions.SQLiteSessionStore(path), sessions.SQLiteSessionStore(path)
+    first.append("s", 0, messages(0, 3))
+    second.append("s", 3, messages(3, 4))
+    snapshot = first.append("s", 4, messages(4, 5))
+    assert list(snapshot.messages) == messages(0, 5)
+    assert snapshot.text == second.append("s", 5, []).text
+
+def test_prefix_slices_stay_inside_the_view():
+    items = [0, 1, 2, 3]
+    prefix = sessions.Prefix(items, 3)
+    items.append(4)
+    assert prefix[-1] == 2
+    assert prefix[1:] == [1, 2]
+    with pytest.raises(IndexError):
+        prefix[3]
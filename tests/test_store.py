@@ -0,0 +1,77 @@
+"""Unit tests for ApiWork.store. Run from the repository root: python -m pytest tests"""
+import threading
+
+import pytest
+
+from ApiWork import store
+
+@pytest.fixture(params=["memory", "sqlite"])
+def actions(request, tmp_path):
+    if request.param == "memory":
+        return store.MemoryActionStore()
+    return store.SQLiteActionStore(str(tmp_path / "actions.db"))
+
+def action(action_id, summary="Sync with Grant"):
+    return {"uuid": action_id, "status": "pending", "created_at": "2030-01-01 10:00:00", "data": {"summary": summary}}
+
+def test_update_replaces_only_data(actions):
+    actions.add(action("a"))
+    assert actions.update("a", {"summary": "Sync with Sam"})
+    stored = actions.get("a")
+    assert stored["data"] == {"summary": "Sync with Sam"}
+    assert stored["status"] == "pending"
+
+def test_update_of_missing_action_fails(actions):
+    assert not actions.update("missing", {"summary": "Sync with Sam"})
+
+def test_update_after_claim_fails(actions):
+    actions.add(action("a"))
+    assert actions.set_status("a", "executing", expected="pending")
+    assert not actions.update("a", {"summary": "Sync with Sam"})
+    assert actions.get("a")["data"] == {"summary": "Sync with Grant"}
+    assert actions.get("a")["status"] == "executing"
+
+def test_claim_is_won_once(actions):
+    actions.add(action("a"))
+    assert actions.set_status("a", "executing", expected="pending")
+    assert not actions.set_status("a", "executing", expected="pending")
+
+def test_concurrent_updates_never_undo_a_claim(actions):
+    actions.add(action("a"))
+    claimed = threading.Event()
+    late_updates = []
+
+    def edit(n):
+        updated = actions.update("a", {"summary": f"Edit {n}"})
+        if updated and claimed.is_set():
+            late_updates.append(n)
+
+    threads = [threading.Thread(target=edit, args=(n,)) for n in range(20)]
+    for thread in threads[:10]:
+        thread.start()
+    assert actions.set_status("a", "executing", expected="pending")
+    claimed.set()
+    for thread in threads[10:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert late_updates == []
+    assert actions.get("a")["status"] == "executing"
+
+def test_released_action_can_be_updated_again(actions):
+    actions.add(action("a"))
+    actions.set_status("a", "executing", expected="pending")
+    assert actions.release_stale(older_than=-1) == ["a"]
+    assert actions.update("a", {"summary": "Sync with Sam"})
+
+def test_changes_since_reports_updates(actions):
+    actions.add(action("a"))
+    version = actions.version()
+    actions.update("a", {"summary": "Sync with Sam"})
+    changes = actions.changes_since(version)
+    assert [change["kind"] for change in changes] == ["updated"]
+    assert changes[0]["action"]["data"] == {"summary": "Sync with Sam"}
+
+def test_changes_since_a_future_version_needs_a_snapshot(actions):
+    actions.add(action("a"))
+    assert actions.changes_since(actions.version() + 5) is None